@@ -1,40 +1,28 @@
-import openai
-
-class Agent:
-    def __init__(self, name, system_prompt, tools=None, memory=None, model="gpt-4"):
-        self.name = name
-        self.system_prompt = system_prompt
-        self.tools = tools or []
-        self.memory = memory or []
-        self.model = model
-
-    def run(self, user_input):
-        messages = [{"role": "system", "content": self.system_prompt}]
-
-        # Add memory
-        for msg in self.memory:
-            messages.append(msg)
-        messages.append({"role": "user", "content": user_input})
-
-        # Call model
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=messages
-        )
-        reply = response.choices[0].message.content
-
-        # Update memory
-        self.memory.append({"role": "user", "content": user_input})
-        self.memory.append({"role": "assistant", "content": reply})
-        self.memory = self.memory[-10:]
-
-        return reply
-
-    def add_tool(self, tool_func):
-        self.tools.append(tool_func)
-
-    def use_tool(self, name, *args, **kwargs):
-        for tool in self.tools:
-            if tool.__name__ == name:
-                return tool(*args, **kwargs)
-        raise ValueError(f"Tool '{name}' not found")
+from core.agent_registry import AgentDefinition, register_agent
+
+# Shared by the CLI and Telegram bot
+register_agent(AgentDefinition(
+    name="CryptoVision",
+    prompt="crypto_analyst",
+    command_budgets={"chat": 512, "analyze": 1024, "forecast": 768},
+))
+
+register_agent(AgentDefinition(
+    name="CryptoVisionAPI",
+    prompt="crypto_analyst_api",
+    command_budgets={"chat": 512, "analyze": 1024, "forecast": 768},
+))
+
+# Price-focused bot in tools/Crypto_Telegram_Bot.py
+register_agent(AgentDefinition(
+    name="CryptoVisionConcise",
+    prompt="crypto_analyst_concise",
+    tools=("get_price",),
+    max_tokens=512,
+))
+
+# Example bot in examples/crypto_telegram_bot.py
+register_agent(AgentDefinition(
+    name="CryptoVisionDisclaimer",
+    prompt="crypto_analyst_disclaimer",
+))
@@ -1,5 +1,23 @@
+import json
+import logging
+import threading
 import openai
-from typing import List, Callable, Optional, Dict
+from itertools import islice
+from typing import List, Callable, Optional, Dict, Mapping, Tuple
+
+from core.governor import MIN_OUTPUT_TOKENS, BudgetExceeded, Governor, estimate_tokens, governor as default_governor
+from core.prompts import usage_value
+from core.prompts import PromptCacheStats, build_prefix, prefix_key, render_prompt
+from core.speculation import SPECULATIVE_TOOLS, Speculation, SpeculationStats
+from core.tools import tool_schema
+from tools.coingecko import to_token_id
+
+logger = logging.getLogger(__name__)
+
+# Tool-call round trips allowed before the model must answer
+MAX_TOOL_ROUNDS = 3
+# How long a degraded reply waits for speculative tool results
+FALLBACK_WAIT_SECONDS = 3.0
 
 class Agent:
     def __init__(
@@ -10,7 +28,11 @@ class Agent:
         memory: Optional[List[Dict]] = None,
         model: str = "gpt-4",
         temperature: float = 0.7,
-        max_tokens: int = 1024
+        max_tokens: int = 1024,
+        history_limit: int = 10,
+        command_budgets: Optional[Mapping[str, int]] = None,
+        governor: Optional[Governor] = None,
+        shared: bool = False
     ):
         self.name = name
         self.system_prompt = system_prompt.strip()
@@ -19,37 +41,189 @@ class Agent:
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.history_limit = history_limit
+        self.command_budgets = dict(command_budgets or {})
+        self.governor = governor or default_governor
+        # Shared registry instances never store per-conversation state
+        self.shared = shared
+        self.cache_stats = PromptCacheStats()
+        self.speculation_stats = SpeculationStats()
+        self._buffers = threading.local()
+        self._refresh_prefix()
 
-    def build_messages(self, user_input: str) -> List[Dict]:
-        messages = [{"role": "system", "content": self.system_prompt}]
-        messages.extend(self.memory[-10:])
+    def _refresh_prefix(self):
+        # Built once per configuration change, shared by every turn
+        self.prefix = build_prefix(self.system_prompt, self.list_tools())
+        self.prefix_key = prefix_key(self.prefix)
+        self.tool_specs = [{"type": "function", "function": tool_schema(t)} for t in self.tools]
+
+    def build_messages(self, user_input: str, history: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Fill this thread's reusable message list: the shared prefix, the tail
+        of `history` (referenced, not copied) and the user turn. The list is
+        valid until the next build_messages call on the same thread.
+        """
+        if history is None:
+            if self.shared:
+                raise ValueError(f"Agent '{self.name}' is shared; pass the conversation history")
+            history = self.memory
+        messages = getattr(self._buffers, "messages", None)
+        if messages is None or getattr(self._buffers, "prefix_key", None) != self.prefix_key:
+            messages = self._buffers.messages = list(self.prefix)
+            self._buffers.prefix_key = self.prefix_key
+        del messages[len(self.prefix):]
+        if self.history_limit:
+            messages.extend(islice(history, max(0, len(history) - self.history_limit), None))
         messages.append({"role": "user", "content": user_input})
         return messages
 
-    def run(self, user_input: str) -> str:
-        messages = self.build_messages(user_input)
+    def max_tokens_for(self, command: Optional[str] = None) -> int:
+        return self.command_budgets.get(command or "chat", self.max_tokens)
+
+    def run(
+        self,
+        user_input: str,
+        history: Optional[List[Dict]] = None,
+        command: Optional[str] = None,
+        user_id: str = "anonymous",
+        fallback: Optional[str] = None
+    ) -> str:
+        """
+        Run one turn. When `history` is given the caller owns the conversation
+        and the agent's own memory is left untouched, so a single instance can
+        be shared across users.
+        Calls are admitted and accounted by the governor; when the user is over
+        budget, `fallback` (or a short notice) is returned without calling the model.
+        """
+        messages = self.build_messages(user_input, history)
 
         try:
+            message, _ = self._complete(messages, command, user_id)
+            reply = (message.get("content") or "").strip()
+            if history is None:
+                self._remember(user_input, reply)
+            return reply
+
+        except BudgetExceeded as e:
+            self.governor.record_degraded(user_id, self.name, command)
+            return fallback or f"⚠️ {e}. Please try again later."
+
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
+
+    def _complete(
+        self,
+        messages: List[Dict],
+        command: Optional[str],
+        user_id: str,
+        tools: Optional[List[Dict]] = None,
+        max_tokens: Optional[int] = None
+    ) -> Tuple[Dict, int]:
+        """
+        One governed model request, capped at `max_tokens` (default: the
+        command's budget). Returns the reply message and the completion
+        tokens it used; raises BudgetExceeded.
+        """
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        extra = {"tools": tools} if tools else {}
+        budget = self.max_tokens_for(command) if max_tokens is None else max_tokens
+        with self.governor.reserve(user_id, prompt_tokens, budget) as max_tokens:
             response = openai.ChatCompletion.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens,
+                max_tokens=max_tokens,
+                **extra,
             )
-            reply = response.choices[0].message["content"].strip()
+        self.governor.record(user_id, self.name, command, self.model, response.get("usage"))
+        self.cache_stats.record(response.get("usage"))
+        logger.debug("%s prompt cache: %s", self.name, self.cache_stats.as_dict())
+        return response.choices[0].message, usage_value(response.get("usage"), "completion_tokens")
+
+    def _remember(self, user_input: str, reply: str):
+        # Update memory
+        self.memory.append({"role": "user", "content": user_input})
+        self.memory.append({"role": "assistant", "content": reply})
+        self.memory = self.memory[-20:]  # limit to last 10 exchanges
+
+    def run_command(
+        self,
+        command: str,
+        token: str,
+        history: Optional[List[Dict]] = None,
+        user_id: str = "anonymous"
+    ) -> str:
+        """
+        Run a templated command (`analyze`, `forecast`) for a token with the
+        agent's tools offered to the model. The usual tool calls for the token
+        are started speculatively alongside the first model request, and
+        served from there if the model asks for them; every tool call of a
+        round is answered in the next request.
+        The command's output budget covers all of its model requests together.
+        Over budget, the speculative tool results alone are returned.
+        """
+        instruction = render_prompt(command, token=token)
+        if not self.tool_specs:
+            return self.run(instruction, history=history, command=command, user_id=user_id)
 
-            # Update memory
-            self.memory.append({"role": "user", "content": user_input})
-            self.memory.append({"role": "assistant", "content": reply})
-            self.memory = self.memory[-20:]  # limit to last 10 exchanges
+        token_id = to_token_id(token)
+        speculation = Speculation(self.speculation_stats)
+        speculation.start({t.__name__: t for t in self.tools}, SPECULATIVE_TOOLS, token_id)
+        instruction = render_prompt("tool_context", instruction=instruction, token=token, token_id=token_id)
+        messages = self.build_messages(instruction, history)
 
+        budget = self.max_tokens_for(command)
+        try:
+            for _ in range(MAX_TOOL_ROUNDS):
+                message, used = self._complete(messages, command, user_id, self.tool_specs, budget)
+                budget -= used
+                calls = [
+                    {"id": c["id"], "type": "function", "function": {"name": c["function"]["name"], "arguments": c["function"].get("arguments") or "{}"}}
+                    for c in message.get("tool_calls") or ()
+                ]
+                if not calls:
+                    break
+                if budget < MIN_OUTPUT_TOKENS:
+                    raise BudgetExceeded("Command output budget used up")
+                messages.append({"role": "assistant", "content": message.get("content"), "tool_calls": calls})
+                for call in calls:
+                    result = self._call_tool(call["function"]["name"], call["function"]["arguments"], speculation)
+                    messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+            else:
+                message, _ = self._complete(messages, command, user_id, max_tokens=budget)
+            reply = (message.get("content") or "").strip()
+            if history is None:
+                self._remember(instruction, reply)
             return reply
 
+        except BudgetExceeded as e:
+            self.governor.record_degraded(user_id, self.name, command)
+            data = speculation.results(FALLBACK_WAIT_SECONDS)
+            if data:
+                return "⚠️ Usage limit reached, showing market data only.\n\n" + "\n\n".join(data.values())
+            return f"⚠️ {e}. Please try again later."
+
         except Exception as e:
             return f"❌ Error: {str(e)}"
 
+        finally:
+            speculation.close()
+            logger.debug("%s speculation: %s", self.name, self.speculation_stats.as_dict())
+
+    def _call_tool(self, name: str, arguments: str, speculation: Speculation) -> str:
+        try:
+            args = json.loads(arguments)
+        except ValueError:
+            args = {}
+        arg = str(next(iter(args.values()), "")) if isinstance(args, dict) else ""
+        result = speculation.take(name, to_token_id(arg)) if arg else None
+        return result if result is not None else self.use_tool(name, arg)
+
     def add_tool(self, tool_func: Callable):
+        if self.shared:
+            raise ValueError(f"Agent '{self.name}' is shared; register a definition with the tool instead")
         self.tools.append(tool_func)
+        self._refresh_prefix()
 
     def list_tools(self) -> List[str]:
         return [t.__name__ for t in self.tools]
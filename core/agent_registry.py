@@ -0,0 +1,90 @@
+import threading
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from core.agent import Agent
+from core.prompts import render_prompt
+from core.tools import get_tool, list_tools
+
+
+@dataclass(frozen=True)
+class AgentDefinition:
+    """
+    Declarative agent configuration.
+    `tools=None` allows every registered tool; `command_budgets` maps a
+    command name (e.g. "analyze") to its max output tokens.
+    """
+    name: str
+    prompt: str
+    tools: Optional[Tuple[str, ...]] = None
+    model: str = "gpt-4"
+    temperature: float = 0.7
+    max_tokens: int = 1024
+    history_limit: int = 10
+    command_budgets: Mapping[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        object.__setattr__(self, "command_budgets", MappingProxyType(dict(self.command_budgets)))
+        if self.tools is not None:
+            object.__setattr__(self, "tools", tuple(self.tools))
+
+
+# Define a registry for agent definitions and their shared instances
+agent_registry: Dict[str, AgentDefinition] = {}
+_instances: Dict[str, Agent] = {}
+_instances_lock = threading.Lock()
+
+def register_agent(definition: AgentDefinition) -> AgentDefinition:
+    agent_registry[definition.name] = definition
+    with _instances_lock:
+        _instances.pop(definition.name, None)
+    return definition
+
+def get_definition(name: str) -> AgentDefinition:
+    load_all_agents()
+    if name in agent_registry:
+        return agent_registry[name]
+    raise ValueError(f"Agent '{name}' not found")
+
+def list_agents() -> List[str]:
+    load_all_agents()
+    return list(agent_registry.keys())
+
+def build_agent(definition: AgentDefinition, shared: bool = False) -> Agent:
+    tool_names = list_tools() if definition.tools is None else definition.tools
+    return Agent(
+        name=definition.name,
+        system_prompt=render_prompt(definition.prompt, agent_name=definition.name),
+        tools=[get_tool(t) for t in tool_names],
+        model=definition.model,
+        temperature=definition.temperature,
+        max_tokens=definition.max_tokens,
+        history_limit=definition.history_limit,
+        command_budgets=definition.command_budgets,
+        shared=shared,
+    )
+
+def get_agent(name: str) -> Agent:
+    """
+    Return the shared instance for a registered agent, building it on first use.
+    The instance is read-only: callers must pass conversation history to
+    `Agent.run`, and tools cannot be added to it.
+    """
+    definition = get_definition(name)
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = build_agent(definition, shared=True)
+        return _instances[name]
+
+def create_agent(name: str, **overrides) -> Agent:
+    """
+    Build a private instance of a registered agent with some fields overridden.
+    """
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return build_agent(replace(get_definition(name), **overrides))
+
+def load_all_agents():
+    # Importing the modules registers their definitions
+    import agents.crypto_analyst  # noqa: F401
+    return agent_registry
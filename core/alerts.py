@@ -0,0 +1,219 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from bisect import bisect_left, insort
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ABOVE = "above"
+BELOW = "below"
+
+ALERTS_PATH = os.getenv("ALERTS_PATH", "alerts.json")
+MAX_ALERTS_PER_USER = int(os.getenv("MAX_ALERTS_PER_USER", "20"))
+
+
+def format_price(price: float) -> str:
+    return f"${price:,.2f}" if price >= 1 else f"${price:.6g}"
+
+
+class Alert:
+    __slots__ = ("id", "user_id", "token_id", "direction", "threshold", "label")
+
+    def __init__(self, alert_id: int, user_id: str, token_id: str, direction: str, threshold: float, label: str):
+        self.id = alert_id
+        self.user_id = user_id
+        self.token_id = token_id
+        self.direction = direction
+        self.threshold = threshold
+        self.label = label
+
+    def describe(self) -> str:
+        text = f"#{self.id} {self.token_id} {self.direction} {format_price(self.threshold)}"
+        return f"{text} ({self.label})" if self.label else text
+
+
+class AlertEngine:
+    """
+    One-shot price alerts kept in per-token sorted indexes.
+
+    Each index is ordered so that the alerts crossed by a price are a suffix:
+    "above" alerts are keyed by -threshold and "below" alerts by threshold.
+    A tick therefore costs one bisect per index plus the number of alerts
+    that fire, regardless of how many are registered.
+
+    With a `path`, alerts are saved as JSON after every change and reloaded
+    on start, so they survive restarts.
+    """
+    def __init__(self, path: Optional[str] = None, max_per_user: int = MAX_ALERTS_PER_USER):
+        self.path = path
+        self.max_per_user = max_per_user
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.alerts: Dict[int, Alert] = {}
+        self._by_user: Dict[str, Set[int]] = {}
+        self._index: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable alerts file %s: %s", self.path, e)
+            return
+        with self._lock:
+            for row in rows:
+                self._insert(Alert(*row))
+            self._ids = itertools.count(max(self.alerts, default=0) + 1)
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                rows = [[a.id, a.user_id, a.token_id, a.direction, a.threshold, a.label] for a in self.alerts.values()]
+            directory = os.path.dirname(self.path) or "."
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix=".alerts.", suffix=".tmp", dir=directory)
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(rows, f)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            except OSError as e:
+                logger.warning("Could not persist alerts to %s: %s", self.path, e)
+
+    def _insert(self, alert: Alert):
+        # Caller holds the lock
+        self.alerts[alert.id] = alert
+        self._by_user.setdefault(alert.user_id, set()).add(alert.id)
+        insort(self._index.setdefault((alert.token_id, alert.direction), []), (self._key(alert.direction, alert.threshold), alert.id))
+
+    @staticmethod
+    def _key(direction: str, threshold: float) -> float:
+        return -threshold if direction == ABOVE else threshold
+
+    def add(self, user_id: str, token_id: str, direction: str, threshold: float, label: Optional[str] = None) -> Alert:
+        if direction not in (ABOVE, BELOW):
+            raise ValueError(f"Unknown alert direction '{direction}'")
+        if not math.isfinite(threshold) or threshold <= 0:
+            raise ValueError("Alert threshold must be a positive number")
+        with self._lock:
+            if len(self._by_user.get(user_id, ())) >= self.max_per_user:
+                raise ValueError(f"You can have at most {self.max_per_user} active alerts")
+            alert = Alert(next(self._ids), user_id, token_id, direction, threshold, label or "")
+            self._insert(alert)
+        self._save()
+        return alert
+
+    def add_percent(self, user_id: str, token_id: str, percent: float, reference_price: float) -> Alert:
+        """
+        Alert when the price moves `percent` (signed) away from `reference_price`.
+        """
+        if not math.isfinite(percent) or percent == 0:
+            raise ValueError("Alert move must be a non-zero percentage")
+        direction = ABOVE if percent > 0 else BELOW
+        threshold = reference_price * (1 + percent / 100)
+        return self.add(user_id, token_id, direction, threshold, label=f"{percent:+g}% from {format_price(reference_price)}")
+
+    def remove(self, alert_id: int, user_id: Optional[str] = None) -> bool:
+        with self._lock:
+            alert = self.alerts.get(alert_id)
+            if alert is None or (user_id is not None and alert.user_id != user_id):
+                return False
+            index = self._index[(alert.token_id, alert.direction)]
+            entry = (self._key(alert.direction, alert.threshold), alert.id)
+            pos = bisect_left(index, entry)
+            if pos < len(index) and index[pos] == entry:
+                del index[pos]
+            else:
+                logger.warning("Alert #%d missing from its index position", alert.id)
+                index.remove(entry)
+            self._forget(alert)
+        self._save()
+        return True
+
+    def _forget(self, alert: Alert):
+        del self.alerts[alert.id]
+        user_ids = self._by_user[alert.user_id]
+        user_ids.discard(alert.id)
+        if not user_ids:
+            del self._by_user[alert.user_id]
+
+    def for_user(self, user_id: str) -> List[Alert]:
+        with self._lock:
+            return sorted((self.alerts[i] for i in self._by_user.get(user_id, ())), key=lambda a: a.id)
+
+    def tokens(self) -> List[str]:
+        with self._lock:
+            return sorted({token_id for (token_id, _), index in self._index.items() if index})
+
+    def tick(self, prices: Dict[str, float]) -> List[Tuple[Alert, float]]:
+        """
+        Apply a batch of prices and return the (alert, price) pairs that fired.
+        Fired alerts are removed.
+        """
+        fired = []
+        with self._lock:
+            for token_id, price in prices.items():
+                if price is None or not math.isfinite(price):
+                    continue
+                for direction in (ABOVE, BELOW):
+                    index = self._index.get((token_id, direction))
+                    if not index:
+                        continue
+                    start = bisect_left(index, (self._key(direction, price), -1))
+                    for _, alert_id in index[start:]:
+                        alert = self.alerts[alert_id]
+                        self._forget(alert)
+                        fired.append((alert, price))
+                    del index[start:]
+        if fired:
+            self._save()
+        return fired
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+
+async def run_alert_loop(
+    engine: AlertEngine,
+    fetch_prices: Callable[[Iterable[str]], Dict[str, float]],
+    notify: Callable[[Alert, float], Awaitable[None]],
+    interval: float = 60.0,
+):
+    """
+    Poll prices for every token that has alerts with one batched fetch per
+    interval and push each fired alert through `notify`. `fetch_prices` runs
+    in a worker thread, so a simulated feed can be swapped in for testing.
+    """
+    while True:
+        tokens = engine.tokens()
+        if tokens:
+            try:
+                prices = await asyncio.to_thread(fetch_prices, tokens)
+            except Exception as e:
+                logger.warning("Alert price fetch failed: %s", e)
+                prices = {}
+            try:
+                fired = engine.tick(prices)
+            except Exception:
+                logger.exception("Alert tick failed")
+                fired = []
+            for alert, price in fired:
+                try:
+                    await notify(alert, price)
+                except Exception as e:
+                    logger.warning("Failed to deliver alert #%d: %s", alert.id, e)
+        await asyncio.sleep(interval)
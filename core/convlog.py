@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Compact append-only conversation log.
+
+Layout of `conversations.nxl`: a sequence of blocks, normally one per
+exchange (a user message and its reply).
+
+    block header  <4sHIdd  magic, user id length, message count, first ts, last ts
+    user id       UTF-8 bytes
+    messages      <BdI     role id, timestamp, content length, then UTF-8 content
+
+Roles are interned as one-byte ids. The sidecar `conversations.bidx` holds one
+fixed-width <QIIdd record per block (offset, user number, message count,
+first/last ts); user numbers are line numbers in `conversations.users`.
+Readers seek straight to a user's or a time range's blocks, and pick up blocks
+appended by other processes by reading the tail of the index.
+
+Appends hold an exclusive flock on `conversations.lock`, so the Telegram bots
+and the API server can share one log directory.
+
+Usage:
+  python -m core.convlog migrate [--src memory_logs]
+  python -m core.convlog top [--days 7] [--limit 20]
+"""
+import argparse
+import atexit
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are then only serialized within a process
+    fcntl = None
+
+from core.memory import MEMORY_DIR
+
+logger = logging.getLogger(__name__)
+
+CONVLOG_DIR = os.getenv("CONVLOG_DIR", MEMORY_DIR)
+
+MAGIC = b"NXB1"
+BLOCK_HEADER = struct.Struct("<4sHIdd")
+MESSAGE_HEADER = struct.Struct("<BdI")
+INDEX_RECORD = struct.Struct("<QIIdd")
+ROLES = ("system", "user", "assistant", "tool")
+ROLE_IDS = {role: i for i, role in enumerate(ROLES)}
+# System message recording that a user's conversation was cleared
+CLEAR_MARKER = "\x00cleared"
+# User messages buffered without a reply before they are written anyway
+MAX_PENDING = 8
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9\-]{1,}")
+
+
+class Message(NamedTuple):
+    role: str
+    timestamp: float
+    # memoryview into the mapped file when read with decode=False
+    content: Union[str, memoryview]
+
+
+class BlockRef(NamedTuple):
+    user_id: str
+    offset: int
+    count: int
+    first_ts: float
+    last_ts: float
+
+
+def _text(view: memoryview, start: int, length: int) -> str:
+    chunk = view[start:start + length]
+    try:
+        return str(chunk, "utf-8", errors="replace")
+    finally:
+        chunk.release()
+
+
+class ConversationLog:
+    def __init__(self, root: str = CONVLOG_DIR):
+        self.root = root
+        self.data_path = os.path.join(root, "conversations.nxl")
+        self.index_path = os.path.join(root, "conversations.bidx")
+        self.users_path = os.path.join(root, "conversations.users")
+        self.lock_path = os.path.join(root, "conversations.lock")
+        self.migrated_path = os.path.join(root, "conversations.migrated")
+        self._lock = threading.RLock()
+        self.blocks: List[BlockRef] = []
+        self.by_user: Dict[str, List[int]] = {}
+        self._user_names: List[str] = []
+        self._user_nums: Dict[str, int] = {}
+        self._users_pos = 0
+        self._index_pos = 0
+        self._pending: Dict[str, List[Tuple[str, str, float]]] = {}
+        self._import_json_index()
+        self._refresh()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Load index records written since the last call, by this or another process.
+        Torn trailing records and user lines are ignored until completed.
+        """
+        with self._lock:
+            if os.path.exists(self.users_path) and os.path.getsize(self.users_path) > self._users_pos:
+                with open(self.users_path, "rb") as f:
+                    f.seek(self._users_pos)
+                    chunk = f.read()
+                complete = chunk[:chunk.rfind(b"\n") + 1]
+                for line in complete.splitlines():
+                    name = line.decode("utf-8")
+                    self._user_nums[name] = len(self._user_names)
+                    self._user_names.append(name)
+                self._users_pos += len(complete)
+
+            if not os.path.exists(self.index_path):
+                return
+            size = os.path.getsize(self.index_path)
+            size -= size % INDEX_RECORD.size
+            if size <= self._index_pos:
+                return
+            data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_pos)
+                chunk = f.read(size - self._index_pos)
+            for offset, user_num, count, first_ts, last_ts in INDEX_RECORD.iter_unpack(chunk):
+                if user_num >= len(self._user_names) or offset >= data_size:
+                    break
+                self._register(BlockRef(self._user_names[user_num], offset, count, first_ts, last_ts))
+                self._index_pos += INDEX_RECORD.size
+
+    def _register(self, ref: BlockRef):
+        self.by_user.setdefault(ref.user_id, []).append(len(self.blocks))
+        self.blocks.append(ref)
+
+    def _write_index(self, ref: BlockRef):
+        # Caller holds both locks and has just refreshed
+        user_num = self._user_nums.get(ref.user_id)
+        if user_num is None:
+            line = ref.user_id.encode("utf-8") + b"\n"
+            with open(self.users_path, "ab") as f:
+                f.truncate(self._users_pos)
+                f.write(line)
+            user_num = self._user_nums[ref.user_id] = len(self._user_names)
+            self._user_names.append(ref.user_id)
+            self._users_pos += len(line)
+        with open(self.index_path, "ab") as f:
+            f.truncate(self._index_pos)
+            f.write(INDEX_RECORD.pack(ref.offset, user_num, ref.count, ref.first_ts, ref.last_ts))
+        self._index_pos += INDEX_RECORD.size
+        self._register(ref)
+
+    def _import_json_index(self):
+        # Logs written before the binary index kept one JSON line per block
+        legacy_path = os.path.join(self.root, "conversations.idx")
+        if not os.path.exists(legacy_path) or os.path.exists(self.index_path):
+            return
+        with self._lock, self._file_lock():
+            if os.path.exists(self.index_path):
+                return
+            self._refresh()
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ref = BlockRef(*json.loads(line))
+                    except (ValueError, TypeError):
+                        break  # torn trailing line
+                    self._write_index(ref)
+
+    def append(self, user_id: str, messages: Sequence[Tuple[str, str, float]]) -> Optional[BlockRef]:
+        """
+        Append (role, content, timestamp) messages for one user as a single block.
+        """
+        if not messages:
+            return None
+        if "\n" in user_id:
+            raise ValueError("User ids may not contain newlines")
+        user = user_id.encode("utf-8")
+        parts = [b"", user]
+        for role, content, ts in messages:
+            body = content.encode("utf-8")
+            parts.append(MESSAGE_HEADER.pack(ROLE_IDS[role], ts, len(body)))
+            parts.append(body)
+        first_ts, last_ts = messages[0][2], messages[-1][2]
+        parts[0] = BLOCK_HEADER.pack(MAGIC, len(user), len(messages), first_ts, last_ts)
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            with open(self.data_path, "ab") as f:
+                # The end of file, as seen under the lock; other processes may have appended
+                offset = f.seek(0, os.SEEK_END)
+                f.write(b"".join(parts))
+            ref = BlockRef(user_id, offset, len(messages), first_ts, last_ts)
+            self._write_index(ref)
+        return ref
+
+    def add(self, user_id: str, role: str, content: str):
+        """
+        Buffer a message. A user's buffered messages are written as one block
+        when a non-user message (the reply) arrives.
+        """
+        with self._lock:
+            pending = self._pending.setdefault(user_id, [])
+            pending.append((role, content, time.time()))
+            if role == "user" and len(pending) < MAX_PENDING:
+                return
+            del self._pending[user_id]
+        self.append(user_id, pending)
+
+    def clear(self, user_id: str):
+        self.add(user_id, "system", CLEAR_MARKER)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for user_id, messages in pending.items():
+            self.append(user_id, messages)
+
+    def users(self) -> List[str]:
+        self._refresh()
+        return list(self.by_user.keys())
+
+    def migrated(self) -> Set[str]:
+        """
+        Names of the JSON memory files already imported by migrate_json_logs.
+        """
+        if not os.path.exists(self.migrated_path):
+            return set()
+        with open(self.migrated_path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def mark_migrated(self, name: str):
+        with self._lock, self._file_lock():
+            with open(self.migrated_path, "a", encoding="utf-8") as f:
+                f.write(name + "\n")
+
+    def select(self, user_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> List[BlockRef]:
+        self._refresh()
+        with self._lock:
+            positions = self.by_user.get(user_id, []) if user_id is not None else range(len(self.blocks))
+            refs = [
+                self.blocks[i] for i in positions
+                if (since is None or self.blocks[i].last_ts >= since) and (until is None or self.blocks[i].first_ts <= until)
+            ]
+        # Blocks are appended nearly in time order; migrated history is the exception
+        refs.sort(key=lambda ref: ref.first_ts)
+        return refs
+
+    @contextmanager
+    def _mapped(self) -> Iterator[memoryview]:
+        with open(self.data_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def _entries(self, view: memoryview, ref: BlockRef) -> List[Tuple[str, float, int, int]]:
+        """
+        Validated (role, timestamp, content start, content length) of a block's
+        messages, or [] if the block is damaged or belongs to another user.
+        """
+        try:
+            magic, user_len, count, _, _ = BLOCK_HEADER.unpack_from(view, ref.offset)
+            if magic != MAGIC or count != ref.count:
+                raise ValueError("bad block header")
+            pos = ref.offset + BLOCK_HEADER.size
+            owner = _text(view, pos, user_len)
+            if owner != ref.user_id:
+                raise ValueError(f"block belongs to '{owner}'")
+            pos += user_len
+            entries = []
+            for _ in range(count):
+                role_id, ts, length = MESSAGE_HEADER.unpack_from(view, pos)
+                pos += MESSAGE_HEADER.size
+                if role_id >= len(ROLES) or pos + length > len(view):
+                    raise ValueError("truncated message")
+                entries.append((ROLES[role_id], ts, pos, length))
+                pos += length
+            return entries
+        except (ValueError, struct.error) as e:
+            logger.warning("Skipping conversation log block at offset %d for %s: %s", ref.offset, ref.user_id, e)
+            return []
+
+    def iter_messages(
+        self,
+        user_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        decode: bool = True,
+    ) -> Iterator[Tuple[str, Message]]:
+        """
+        Stream (user_id, Message) pairs in time order, skipping damaged blocks.
+        With decode=False the content is a memoryview over the mapped file,
+        valid until the next message.
+        """
+        refs = self.select(user_id, since, until)
+        if not refs:
+            return
+        with self._mapped() as view:
+            for ref in refs:
+                for role, ts, start, length in self._entries(view, ref):
+                    if (since is not None and ts < since) or (until is not None and ts > until):
+                        continue
+                    if decode:
+                        yield ref.user_id, Message(role, ts, _text(view, start, length))
+                        continue
+                    content = view[start:start + length]
+                    try:
+                        yield ref.user_id, Message(role, ts, content)
+                    finally:
+                        # Drop the export so the mapping can be closed
+                        content.release()
+
+    def tail(self, user_id: str, limit: int) -> List[Dict[str, str]]:
+        """
+        The last `limit` messages of a user's conversation as {"role", "content"}
+        dicts, oldest first, starting after the latest clear marker.
+        """
+        with self._lock:
+            pending = list(self._pending.get(user_id, ()))
+        newest = []
+
+        def take(role: str, content: str) -> bool:
+            if role == "system" and content == CLEAR_MARKER:
+                return False
+            newest.append({"role": role, "content": content})
+            return len(newest) < limit
+
+        if all(take(role, content) for role, content, _ in reversed(pending)):
+            refs = self.select(user_id)
+            if refs:
+                with self._mapped() as view:
+                    for ref in reversed(refs):
+                        entries = self._entries(view, ref)
+                        if not all(take(role, _text(view, start, length)) for role, _, start, length in reversed(entries)):
+                            break
+        return newest[::-1]
+
+    def replay(self, user_id: str) -> Iterator[Dict[str, str]]:
+        """
+        Yield a user's conversation as {"role", "content"} dicts, oldest first,
+        e.g. to feed recorded traffic back through Agent.run.
+        """
+        for _, message in self.iter_messages(user_id):
+            yield {"role": message.role, "content": message.content}
+
+    def top_terms(self, since: Optional[float] = None, limit: int = 20, role: str = "user") -> List[Tuple[str, int]]:
+        """
+        Most frequent words in messages from `role` since a timestamp.
+        """
+        from tools.search_cache import STOPWORDS
+        counts = Counter()
+        for _, message in self.iter_messages(since=since):
+            if message.role == role:
+                counts.update(w for w in _WORD_RE.findall(message.content.lower()) if w not in STOPWORDS)
+        return counts.most_common(limit)
+
+
+def _logged_overlap(history: List[Tuple[str, str]], logged: List[Tuple[str, str]]) -> int:
+    # Length of the longest tail of `history` that is also the tail of `logged`
+    for k in range(min(len(history), len(logged)), 0, -1):
+        if history[-k:] == logged[-k:]:
+            return k
+    return 0
+
+
+def migrate_json_logs(src_dir: str = MEMORY_DIR, log: Optional[ConversationLog] = None) -> int:
+    """
+    Copy every `<user_id>.json` memory file into the conversation log.
+    Imported files are recorded in `conversations.migrated`, so reruns are safe,
+    and from then on PersistentMemory reads those users from the log.
+    Messages a user sent after the log went live are already in it and are
+    not copied twice. The JSON files carry no timestamps, so the imported
+    messages get the file's mtime, or a second before the user's first
+    logged message, whichever is earlier.
+    Returns the number of messages migrated.
+    """
+    log = log or ConversationLog()
+    done = log.migrated()
+    migrated = 0
+    for name in sorted(os.listdir(src_dir)):
+        if not name.endswith(".json") or name in done:
+            continue
+        user_id = name[:-len(".json")]
+        path = os.path.join(src_dir, name)
+        with open(path, "r", encoding="utf-8") as f:
+            history = [(m["role"], m["content"]) for m in json.load(f) if m.get("role") in ROLE_IDS]
+        ts = os.path.getmtime(path)
+        logged = [(m.role, m.content) for _, m in log.iter_messages(user_id)]
+        if logged:
+            history = history[:len(history) - _logged_overlap(history, logged)]
+            ts = min(ts, log.select(user_id)[0].first_ts - 1)
+        log.append(user_id, [(role, content, ts) for role, content in history])
+        migrated += len(history)
+        log.mark_migrated(name)
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nexithium conversation log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import memory_logs/*.json into the conversation log")
+    migrate.add_argument("--src", default=MEMORY_DIR)
+    top = sub.add_parser("top", help="Most frequent terms in user messages")
+    top.add_argument("--days", type=float, default=7)
+    top.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    log = ConversationLog()
+    if args.command == "migrate":
+        print(f"Migrated {migrate_json_logs(args.src, log)} messages into {log.data_path}")
+    else:
+        for term, count in log.top_terms(since=time.time() - args.days * 86400, limit=args.limit):
+            print(f"{count:8d}  {term}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from core.prompts import usage_value
+
+# USD per 1K (prompt, completion) tokens
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+# Smallest output budget worth spending a call on
+MIN_OUTPUT_TOKENS = 64
+
+
+class BudgetExceeded(Exception):
+    """Raised when a call would exceed a user's quota or a concurrency cap."""
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough OpenAI average of ~4 characters per token
+    return len(text) // 4 + 1
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_rate, completion_rate = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4"])
+    return (prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1000
+
+
+class UsageTotals:
+    __slots__ = ("requests", "prompt_tokens", "completion_tokens", "cost", "degraded")
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.degraded = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost, 6),
+            "degraded": self.degraded,
+        }
+
+
+class Governor:
+    """
+    Guards the Agent call path: per-user sliding-window token quotas, per-user
+    and global concurrency caps, and token/cost accounting per user, agent
+    and command.
+    """
+    def __init__(
+        self,
+        user_token_quota: int = 50_000,
+        window_seconds: float = 3600.0,
+        max_concurrent_per_user: int = 2,
+        max_concurrent_total: int = 16,
+        queue_timeout: float = 10.0,
+    ):
+        self.user_token_quota = user_token_quota
+        self.window_seconds = window_seconds
+        self.max_concurrent_per_user = max_concurrent_per_user
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent_total)
+        self._lock = threading.Lock()
+        self._window: Dict[str, Deque[Tuple[float, int]]] = defaultdict(deque)
+        self._window_tokens: Dict[str, int] = defaultdict(int)
+        self._active: Dict[str, int] = defaultdict(int)
+        self.by_user: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_agent: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+        self.by_command: Dict[str, UsageTotals] = defaultdict(UsageTotals)
+
+    @classmethod
+    def from_env(cls) -> "Governor":
+        return cls(
+            user_token_quota=int(os.getenv("USER_TOKEN_QUOTA", "50000")),
+            window_seconds=float(os.getenv("USER_QUOTA_WINDOW_SECONDS", "3600")),
+            max_concurrent_per_user=int(os.getenv("USER_MAX_CONCURRENT", "2")),
+            max_concurrent_total=int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "16")),
+        )
+
+    def _expire(self, user_id: str, now: float):
+        # Lookups must not create entries, or probing arbitrary ids grows memory
+        window = self._window.get(user_id)
+        if window is None:
+            return
+        while window and window[0][0] <= now - self.window_seconds:
+            self._window_tokens[user_id] -= window.popleft()[1]
+        if not window:
+            del self._window[user_id]
+            del self._window_tokens[user_id]
+
+    def remaining(self, user_id: str) -> int:
+        with self._lock:
+            self._expire(user_id, time.monotonic())
+            return self.user_token_quota - self._window_tokens.get(user_id, 0)
+
+    @contextmanager
+    def reserve(self, user_id: str, prompt_tokens: int, max_tokens: int) -> Iterator[int]:
+        """
+        Admit one LLM call and yield the output budget it may use, clamped to
+        the user's remaining quota. Raises BudgetExceeded instead of queueing
+        behind an over-quota or over-concurrent user.
+        """
+        with self._lock:
+            self._expire(user_id, time.monotonic())
+            remaining = self.user_token_quota - self._window_tokens.get(user_id, 0) - prompt_tokens
+            if remaining < MIN_OUTPUT_TOKENS:
+                raise BudgetExceeded("Token quota reached")
+            if self._active.get(user_id, 0) >= self.max_concurrent_per_user:
+                raise BudgetExceeded("Too many requests in flight")
+            self._active[user_id] += 1
+        try:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                raise BudgetExceeded("Service is busy")
+            try:
+                yield min(max_tokens, remaining)
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._active[user_id] -= 1
+                if not self._active[user_id]:
+                    del self._active[user_id]
+
+    def record(self, user_id: str, agent: str, command: Optional[str], model: str, usage) -> float:
+        """
+        Account for a completed call from the provider's usage block. Returns its cost.
+        """
+        prompt_tokens = usage_value(usage, "prompt_tokens")
+        completion_tokens = usage_value(usage, "completion_tokens")
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            self._window[user_id].append((time.monotonic(), prompt_tokens + completion_tokens))
+            self._window_tokens[user_id] += prompt_tokens + completion_tokens
+            for totals in (self.by_user[user_id], self.by_agent[agent], self.by_command[command or "chat"]):
+                totals.requests += 1
+                totals.prompt_tokens += prompt_tokens
+                totals.completion_tokens += completion_tokens
+                totals.cost += cost
+        return cost
+
+    def record_degraded(self, user_id: str, agent: str, command: Optional[str]):
+        with self._lock:
+            for totals in (self.by_user[user_id], self.by_agent[agent], self.by_command[command or "chat"]):
+                totals.degraded += 1
+
+    def user_usage(self, user_id: str) -> Dict[str, float]:
+        with self._lock:
+            totals = self.by_user.get(user_id)
+            usage = totals.as_dict() if totals is not None else UsageTotals().as_dict()
+        usage["window_remaining_tokens"] = self.remaining(user_id)
+        return usage
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "users": {k: v.as_dict() for k, v in self.by_user.items()},
+                "agents": {k: v.as_dict() for k, v in self.by_agent.items()},
+                "commands": {k: v.as_dict() for k, v in self.by_command.items()},
+            }
+
+
+governor = Governor.from_env()
@@ -3,6 +3,8 @@ import os
 from typing import List, Dict
 
 MEMORY_DIR = "memory_logs"
+# Messages of history a PersistentMemory keeps
+MAX_MESSAGES = 50
 os.makedirs(MEMORY_DIR, exist_ok=True)
 
 class ShortTermMemory:
@@ -21,25 +23,41 @@ class ShortTermMemory:
         self.memory = []
 
 class PersistentMemory:
-    def __init__(self, user_id: str):
+    """
+    A user's recent conversation. With a ConversationLog the log is the store,
+    unless the user has a JSON file that `python -m core.convlog migrate` has
+    not imported yet; that file then stays the source of truth and every
+    message is also appended to the log.
+    """
+    def __init__(self, user_id: str, log=None):
         self.user_id = user_id
+        self.log = log  # optional core.convlog.ConversationLog
         self.file_path = os.path.join(MEMORY_DIR, f"{user_id}.json")
+        self.from_log = log is not None and (
+            not os.path.exists(self.file_path) or os.path.basename(self.file_path) in log.migrated()
+        )
         self.memory: List[Dict[str, str]] = self._load()
 
     def _load(self):
+        if self.from_log:
+            return self.log.tail(self.user_id, MAX_MESSAGES)
         if os.path.exists(self.file_path):
             with open(self.file_path, "r", encoding="utf-8") as f:
                 return json.load(f)
         return []
 
     def save(self):
+        if self.from_log:
+            return  # every message is already in the log
         with open(self.file_path, "w", encoding="utf-8") as f:
-            json.dump(self.memory, f, indent=2)
+            json.dump(self.memory, f)
 
     def add(self, role: str, content: str):
         self.memory.append({"role": role, "content": content})
-        self.memory = self.memory[-50:]  # limit log size
+        self.memory = self.memory[-MAX_MESSAGES:]
         self.save()
+        if self.log is not None:
+            self.log.add(self.user_id, role, content)
 
     def get(self) -> List[Dict[str, str]]:
         return self.memory
@@ -47,12 +65,16 @@ class PersistentMemory:
     def clear(self):
         self.memory = []
         self.save()
+        if self.log is not None:
+            self.log.clear(self.user_id)
 
 class MemoryManager:
-    def __init__(self):
+    def __init__(self, log=None):
+        from core.convlog import ConversationLog
         self.sessions = {}
+        self.log = log if log is not None else ConversationLog()
 
     def get_memory(self, user_id: str) -> PersistentMemory:
         if user_id not in self.sessions:
-            self.sessions[user_id] = PersistentMemory(user_id)
+            self.sessions[user_id] = PersistentMemory(user_id, log=self.log)
         return self.sessions[user_id]
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+
+class PromptTemplate:
+    """
+    A prompt template parsed once at registration time.
+    Templates without placeholders are rendered once and reused as-is.
+    """
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text.strip()
+        self.fields: Tuple[str, ...] = tuple(
+            field for _, field, _, _ in Formatter().parse(self.text) if field
+        )
+        self._static: Optional[str] = None if self.fields else self.text
+
+    def render(self, **values) -> str:
+        if self._static is not None:
+            return self._static
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise ValueError(f"Prompt '{self.name}' is missing values for: {', '.join(missing)}")
+        return self.text.format(**values)
+
+
+# Define a registry for prompts
+prompt_registry: Dict[str, PromptTemplate] = {}
+
+def register_prompt(name: str, text: str) -> PromptTemplate:
+    prompt_registry[name] = PromptTemplate(name, text)
+    return prompt_registry[name]
+
+def get_prompt(name: str) -> PromptTemplate:
+    if name in prompt_registry:
+        return prompt_registry[name]
+    raise ValueError(f"Prompt '{name}' not found")
+
+def render_prompt(name: str, **values) -> str:
+    return get_prompt(name).render(**values)
+
+def list_prompts() -> List[str]:
+    return list(prompt_registry.keys())
+
+
+def build_prefix(system_prompt: str, tool_names: List[str]) -> Tuple[Dict[str, str], ...]:
+    """
+    Build the stable message prefix for an agent: persona first, then the
+    tool list. Nothing per-user or per-turn goes here, so the provider can
+    reuse its cached prefix across turns and users.
+    """
+    content = system_prompt.strip()
+    if tool_names:
+        content += "\n\nAvailable tools: " + ", ".join(sorted(tool_names)) + "."
+    return ({"role": "system", "content": content},)
+
+def prefix_key(prefix: Tuple[Dict[str, str], ...]) -> str:
+    digest = hashlib.sha1()
+    for msg in prefix:
+        digest.update(msg["role"].encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(msg["content"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+class PromptCacheStats:
+    """
+    Tracks the prompt and cached-token counts reported by the provider.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage) -> None:
+        details = usage_value(usage, "prompt_tokens_details", None)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage_value(usage, "prompt_tokens")
+            self.cached_tokens += usage_value(details, "cached_tokens")
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            }
+
+
+def usage_value(usage, key: str, default=0):
+    # OpenAI responses expose usage both as objects and as dicts depending on version
+    if usage is None:
+        return default
+    if isinstance(usage, dict):
+        value = usage.get(key, default)
+    else:
+        value = getattr(usage, key, default)
+    return default if value is None else value
+
+
+# --- Agent personas ---
+register_prompt("crypto_analyst", """
+You are {agent_name}, a professional AI crypto analyst.
+Answer clearly, use tools when appropriate, and never provide financial advice.
+""")
+
+register_prompt("crypto_analyst_api", """
+You are CryptoVisionAPI — a professional crypto market analysis assistant.
+Provide clear, accurate, and neutral answers. Use your tools when needed.
+Never provide investment advice.
+""")
+
+register_prompt("crypto_analyst_concise", """
+You are CryptoVision — a professional crypto market analyst.
+You answer clearly, concisely, and accurately. Use logic, token fundamentals, and macro context.
+If the user asks about price, try to use your tools. Never provide financial advice.
+""")
+
+register_prompt("crypto_analyst_disclaimer", """
+You are CryptoVision, an expert crypto analyst. Answer clearly, avoid hype, use tools when asked about tokens or prices. Always say 'This is not financial advice.' when giving analysis or forecasts.
+""")
+
+# --- Command templates ---
+register_prompt("analyze", "Analyze {token}. Include overview, strengths, risks, use cases, outlook.")
+register_prompt("forecast", "Forecast scenarios for {token}. Hypothetical scenario, not financial advice.")
+register_prompt("tool_context", """
+{instruction}
+The CoinGecko id of {token} is {token_id}.
+""")
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tools an analyze/forecast request for a token almost always needs
+SPECULATIVE_TOOLS = ("token_market_data", "token_trend", "token_description")
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="speculate")
+
+
+class SpeculationStats:
+    """
+    Counts speculative tool calls that were used (hits), requested by the
+    model but not speculated (misses) or dropped unused (wasted), and the
+    tool latency hidden behind the LLM request.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "launched": self.launched,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / self.launched, 3) if self.launched else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+class Speculation:
+    """
+    Tool calls started before the model asks for them. `take` hands a result
+    to the model's matching request; `close` drops whatever was not used.
+    """
+    def __init__(self, stats: SpeculationStats):
+        self.stats = stats
+        self._calls: Dict[Tuple[str, str], Tuple[Future, float, list]] = {}
+
+    def start(self, tools: Dict[str, Callable[[str], str]], names: Iterable[str], arg: str):
+        for name in names:
+            if name not in tools:
+                continue
+            finished = []  # completion time, set by the worker
+            future = _executor.submit(self._timed, tools[name], arg, finished)
+            self._calls[(name, arg)] = (future, time.monotonic(), finished)
+        self.stats.add(launched=len(self._calls))
+
+    @staticmethod
+    def _timed(tool: Callable[[str], str], arg: str, finished: list) -> str:
+        try:
+            return tool(arg)
+        finally:
+            finished.append(time.monotonic())
+
+    def take(self, name: str, arg: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Return the speculative result for (name, arg), or None on a miss.
+        """
+        call = self._calls.pop((name, arg), None)
+        if call is None:
+            self.stats.add(misses=1)
+            return None
+        future, launched_at, finished = call
+        asked_at = time.monotonic()
+        try:
+            result = future.result(timeout=timeout)
+        except Exception as e:
+            result = f"⚠️ Tool error: {str(e)}"
+        # Latency hidden = tool time that overlapped the model's generation
+        self.stats.add(hits=1, saved_seconds=max(0.0, min(finished[0] if finished else asked_at, asked_at) - launched_at))
+        return result
+
+    def results(self, timeout: float) -> Dict[str, str]:
+        """
+        Speculative results that finish within `timeout`, without consuming them.
+        """
+        deadline = time.monotonic() + timeout
+        ready = {}
+        for (name, _), (future, _, _) in self._calls.items():
+            try:
+                ready[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                continue
+        return ready
+
+    def close(self):
+        for future, _, _ in self._calls.values():
+            future.cancel()
+        self.stats.add(wasted=len(self._calls))
+        self._calls.clear()
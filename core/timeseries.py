@@ -0,0 +1,278 @@
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import requests
+
+TIMESERIES_DIR = os.getenv("TIMESERIES_DIR", "timeseries")
+
+# Column name -> dtype. Each column is a raw little-endian file per token.
+COLUMNS = {
+    "ts": np.dtype("<i8"),          # unix time in milliseconds
+    "price": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+    "market_cap": np.dtype("<f8"),
+}
+# Columns returned by downsample()
+OHLC_COLUMNS = {
+    "ts": COLUMNS["ts"],
+    "open": COLUMNS["price"],
+    "high": COLUMNS["price"],
+    "low": COLUMNS["price"],
+    "close": COLUMNS["price"],
+    "volume": COLUMNS["volume"],
+    "market_cap": COLUMNS["market_cap"],
+}
+# CoinGecko returns hourly points for ranges of 2-90 days
+INITIAL_BACKFILL_DAYS = 90
+# Skip the upstream call when the newest point is at least this recent
+FRESHNESS_SECONDS = 300
+# Stored history starting within this much of the requested start counts as covering it
+HEAD_TOLERANCE_MS = 86_400_000
+# CoinGecko coin ids; anything else must never reach a filesystem path
+_TOKEN_ID_RE = re.compile(r"[a-z0-9-]+")
+
+
+def valid_token_id(token_id: str) -> bool:
+    return bool(_TOKEN_ID_RE.fullmatch(token_id))
+
+
+class TimeSeriesStore:
+    """
+    Append-only columnar store of per-token price, volume and market-cap series.
+    Reads are zero-copy NumPy views over memory-mapped column files.
+
+    Older history is added by writing a new copy of the token's columns with
+    the older rows in front into `.<token>.building`, renaming it to
+    `.<token>.prepend` once complete, and swapping it in. An interrupted swap
+    is finished on the next read.
+    """
+    def __init__(self, root: str = TIMESERIES_DIR):
+        self.root = root
+        # Reentrant: reads finish pending swaps while a writer may hold the lock
+        self._lock = threading.RLock()
+        self._maps: Dict[str, tuple] = {}
+
+    def _dir(self, token_id: str) -> str:
+        if not valid_token_id(token_id):
+            raise ValueError(f"Invalid token id '{token_id}'")
+        return os.path.join(self.root, token_id)
+
+    def _path(self, token_id: str, column: str) -> str:
+        return os.path.join(self._dir(token_id), f"{column}.bin")
+
+    def _sibling(self, token_id: str, stage: str) -> str:
+        # Staging directories for prepend(); dot-prefixed so tokens() skips them
+        return os.path.join(os.path.dirname(self._dir(token_id)), f".{token_id}.{stage}")
+
+    def _finish_swap(self, token_id: str):
+        staged = self._sibling(token_id, "prepend")
+        old = self._sibling(token_id, "old")
+        if not os.path.isdir(staged) and not os.path.isdir(old):
+            return
+        with self._lock:
+            if os.path.isdir(staged):
+                shutil.rmtree(old, ignore_errors=True)
+                if os.path.isdir(self._dir(token_id)):
+                    os.rename(self._dir(token_id), old)
+                os.rename(staged, self._dir(token_id))
+                self._maps.pop(token_id, None)
+            shutil.rmtree(old, ignore_errors=True)
+
+    def tokens(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if not name.startswith("."))
+
+    def length(self, token_id: str) -> int:
+        # Rows written completely to every column; append() trims any torn tail
+        self._finish_swap(token_id)
+        sizes = []
+        for column, dtype in COLUMNS.items():
+            path = self._path(token_id, column)
+            sizes.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def columns(self, token_id: str) -> Dict[str, np.ndarray]:
+        """
+        Memory-mapped, read-only views of every column for a token.
+        """
+        n = self.length(token_id)
+        cached = self._maps.get(token_id)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        if n == 0:
+            views = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+        else:
+            views = {
+                column: np.memmap(self._path(token_id, column), dtype=dtype, mode="r", shape=(n,))
+                for column, dtype in COLUMNS.items()
+            }
+        self._maps[token_id] = (n, views)
+        return views
+
+    def first_timestamp(self, token_id: str) -> Optional[int]:
+        ts = self.columns(token_id)["ts"]
+        return int(ts[0]) if len(ts) else None
+
+    def last_timestamp(self, token_id: str) -> Optional[int]:
+        ts = self.columns(token_id)["ts"]
+        return int(ts[-1]) if len(ts) else None
+
+    @staticmethod
+    def _rows(ts, price, volume, market_cap, keep=None) -> Dict[str, np.ndarray]:
+        """
+        Sort a batch by timestamp, apply the `keep(ts)` mask and drop duplicate timestamps.
+        """
+        ts = np.asarray(ts, dtype=COLUMNS["ts"])
+        order = np.argsort(ts, kind="stable")
+        rows = {
+            "ts": ts[order],
+            "price": np.asarray(price, dtype=COLUMNS["price"])[order],
+            "volume": np.asarray(volume, dtype=COLUMNS["volume"])[order],
+            "market_cap": np.asarray(market_cap, dtype=COLUMNS["market_cap"])[order],
+        }
+        if keep is not None:
+            mask = keep(rows["ts"])
+            rows = {column: values[mask] for column, values in rows.items()}
+        if len(rows["ts"]):
+            mask = np.concatenate(([True], np.diff(rows["ts"]) > 0))
+            rows = {column: values[mask] for column, values in rows.items()}
+        return rows
+
+    def append(self, token_id: str, ts, price, volume, market_cap) -> int:
+        """
+        Append rows newer than the last stored timestamp. Returns rows written.
+        """
+        with self._lock:
+            last = self.last_timestamp(token_id)
+            rows = self._rows(ts, price, volume, market_cap, None if last is None else (lambda t: t > last))
+            if not len(rows["ts"]):
+                return 0
+            os.makedirs(self._dir(token_id), exist_ok=True)
+            # Cut columns left longer by an interrupted append, so every
+            # column receives the new rows at the same offset
+            n = self.length(token_id)
+            for column, dtype in COLUMNS.items():
+                path = self._path(token_id, column)
+                if os.path.exists(path) and os.path.getsize(path) > n * dtype.itemsize:
+                    os.truncate(path, n * dtype.itemsize)
+            for column, values in rows.items():
+                with open(self._path(token_id, column), "ab") as f:
+                    f.write(values.tobytes())
+            return len(rows["ts"])
+
+    def prepend(self, token_id: str, ts, price, volume, market_cap) -> int:
+        """
+        Add rows older than the first stored timestamp. Returns rows written.
+        """
+        with self._lock:
+            first = self.first_timestamp(token_id)
+            if first is None:
+                return self.append(token_id, ts, price, volume, market_cap)
+            rows = self._rows(ts, price, volume, market_cap, lambda t: t < first)
+            if not len(rows["ts"]):
+                return 0
+            current = self.columns(token_id)
+            building = self._sibling(token_id, "building")
+            shutil.rmtree(building, ignore_errors=True)
+            os.makedirs(building)
+            for column in COLUMNS:
+                with open(os.path.join(building, f"{column}.bin"), "wb") as f:
+                    f.write(rows[column].tobytes())
+                    f.write(np.asarray(current[column]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.rename(building, self._sibling(token_id, "prepend"))
+            self._finish_swap(token_id)
+            return len(rows["ts"])
+
+    def _head_checked(self, token_id: str) -> float:
+        # Earliest start already requested upstream; older data there does not exist
+        try:
+            with open(os.path.join(self._dir(token_id), "head_checked"), "r") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return math.inf
+
+    def range(self, token_id: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Rows with start_ms <= ts <= end_ms, as slices of the memory-mapped columns.
+        """
+        views = self.columns(token_id)
+        ts = views["ts"]
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side="left"))
+        hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side="right"))
+        return {column: values[lo:hi] for column, values in views.items()}
+
+    def downsample(self, token_id: str, bucket_ms: int, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Resample into fixed OHLC buckets: open, high, low and close price,
+        summed volume and last market cap. Empty buckets are omitted; `ts` is
+        the bucket start.
+        """
+        rows = self.range(token_id, start_ms, end_ms)
+        ts = rows["ts"]
+        if not len(ts):
+            return {column: np.empty(0, dtype=dtype) for column, dtype in OHLC_COLUMNS.items()}
+        buckets = ts // bucket_ms
+        starts = np.flatnonzero(np.concatenate(([True], np.diff(buckets) > 0)))
+        ends = np.concatenate((starts[1:], [len(ts)])) - 1
+        price = rows["price"]
+        return {
+            "ts": buckets[starts] * bucket_ms,
+            "open": np.asarray(price[starts]),
+            "high": np.maximum.reduceat(price, starts),
+            "low": np.minimum.reduceat(price, starts),
+            "close": np.asarray(price[ends]),
+            "volume": np.add.reduceat(rows["volume"], starts),
+            "market_cap": np.asarray(rows["market_cap"][ends]),
+        }
+
+    def backfill(self, token_id: str, days: int = INITIAL_BACKFILL_DAYS) -> int:
+        """
+        Fetch points newer than the last stored one from CoinGecko's market_chart,
+        and older ones when the stored history starts later than `days` ago.
+        A token with no history gets `days` of data.
+        """
+        if not valid_token_id(token_id):
+            raise ValueError(f"Invalid token id '{token_id}'")
+        last = self.last_timestamp(token_id)
+        now = time.time()
+        if last is None:
+            return self.append(token_id, *self._fetch(token_id, days))
+        written = 0
+        age = now - last / 1000
+        if age >= FRESHNESS_SECONDS:
+            written += self.append(token_id, *self._fetch(token_id, max(1, math.ceil(age / 86400))))
+        start_ms = int((now - days * 86400) * 1000)
+        first = self.first_timestamp(token_id)
+        if first - start_ms > HEAD_TOLERANCE_MS and start_ms < self._head_checked(token_id):
+            written += self.prepend(token_id, *self._fetch(token_id, days))
+            with open(os.path.join(self._dir(token_id), "head_checked"), "w") as f:
+                f.write(str(start_ms))
+        return written
+
+    def _fetch(self, token_id: str, days: int):
+        url = f"https://api.coingecko.com/api/v3/coins/{token_id}/market_chart"
+        res = requests.get(url, params={"vs_currency": "usd", "days": days}, timeout=10)
+        res.raise_for_status()
+        data = res.json()
+        prices = data.get("prices", [])
+        volumes = data.get("total_volumes", [])
+        caps = data.get("market_caps", [])
+        n = min(len(prices), len(volumes), len(caps))
+        return (
+            [p[0] for p in prices[:n]],
+            [p[1] for p in prices[:n]],
+            [v[1] for v in volumes[:n]],
+            [c[1] for c in caps[:n]],
+        )
+
+
+store = TimeSeriesStore()
@@ -1,3 +1,4 @@
+import inspect
 from typing import Callable, List, Dict
 
 # Define a registry for tools
@@ -20,6 +21,23 @@ def get_tool(name: str) -> Callable:
 def list_tools() -> List[str]:
     return list(tool_registry.keys())
 
+def tool_schema(func: Callable) -> Dict:
+    """
+    OpenAI function schema for a tool: its first parameter as a string argument
+    and the first docstring line as the description.
+    """
+    params = list(inspect.signature(func).parameters)[:1]
+    doc = inspect.getdoc(func) or func.__name__
+    return {
+        "name": func.__name__,
+        "description": doc.splitlines()[0],
+        "parameters": {
+            "type": "object",
+            "properties": {p: {"type": "string"} for p in params},
+            "required": params,
+        },
+    }
+
 # Example: dynamic import of tool modules
 def load_all_tools():
     from tools.coingecko import get_price
@@ -28,6 +46,7 @@ def load_all_tools():
     from tools.token_trend import token_trend
     from tools.token_description import token_description
     from tools.token_market_data import token_market_data
+    from tools.research import research
 
     register_tool("get_price")(get_price)
     register_tool("google_search")(google_search)
@@ -35,6 +54,7 @@ def load_all_tools():
     register_tool("token_trend")(token_trend)
     register_tool("token_description")(token_description)
     register_tool("token_market_data")(token_market_data)
+    register_tool("research")(research)
 
     return tool_registry
 
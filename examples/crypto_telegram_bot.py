@@ -3,9 +3,9 @@ import logging
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, ContextTypes, filters
 
-from core.agent import Agent
+from core.agent_registry import get_agent
 from core.memory import MemoryManager
-from core.tools import load_all_tools, get_tool
+from interfaces.telegram_pipeline import BUSY_MESSAGE, PipelineOverloaded, UpdatePipeline
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -17,37 +17,38 @@ logging.basicConfig(level=logging.INFO)
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
 # === Init agent ===
-tools = load_all_tools()
+AGENT_NAME = "CryptoVisionDisclaimer"
 memory = MemoryManager()
-
-agent = Agent(
-    name="CryptoVision",
-    system_prompt=\"\"\"You are CryptoVision, an expert crypto analyst. Answer clearly, avoid hype, use tools when asked about tokens or prices. Always say 'This is not financial advice.' when giving analysis or forecasts.\"\"\",
-    tools=list(tools.values()),
-)
+pipeline = UpdatePipeline.from_env()
 
 # === Telegram Handlers ===
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("👋 Welcome to CryptoVision Bot! Type something like 'price solana' or 'analyze bitcoin'.")
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_input = update.message.text
-    user_id = str(update.message.chat_id)
-
+def respond(user_id: str, user_input: str) -> str:
     mem = memory.get_memory(user_id)
-    agent.memory = mem.get()
-
-    response = agent.run(user_input)
+    response = get_agent(AGENT_NAME).run(user_input, history=mem.get(), user_id=user_id)
 
     # Save to memory
     mem.add("user", user_input)
     mem.add("assistant", response)
+    return response
+
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_input = update.message.text
+    user_id = str(update.message.chat_id)
+
+    # Runs in a worker thread; other chats keep being served meanwhile
+    try:
+        response = await pipeline.run(user_id, respond, user_id, user_input, bot=context.bot)
+    except PipelineOverloaded:
+        response = BUSY_MESSAGE
 
     await update.message.reply_text(response)
 
 # === Start Bot ===
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = ApplicationBuilder().token(TELEGRAM_TOKEN).concurrent_updates(True).build()
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
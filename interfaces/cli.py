@@ -9,7 +9,7 @@ import argparse
 import logging
 import sys
 
-from core.agent import Agent
+from core.agent_registry import create_agent, get_agent, list_agents
 from core.memory import ShortTermMemory, PersistentMemory, MemoryManager
 from core.tools import load_all_tools, get_tool, list_tools
 
@@ -39,8 +39,8 @@ def parse_args():
         help="User ID for persistent memory (if --memory long)"
     )
     parser.add_argument(
-        "--model", type=str, default="gpt-4",
-        help="OpenAI model name to use (e.g. gpt-4, gpt-3.5-turbo)"
+        "--model", type=str, default=None,
+        help="Override the agent's OpenAI model (e.g. gpt-4, gpt-3.5-turbo)"
     )
     parser.add_argument(
         "--verbose", action="store_true",
@@ -51,9 +51,11 @@ def parse_args():
 
 def main():
     args = parse_args()
+    if args.agent not in list_agents():
+        sys.exit(f"Unknown agent '{args.agent}'. Available: {', '.join(list_agents())}")
     if args.verbose:
         logger.setLevel(logging.DEBUG)
-    logger.info(f"Starting CLI Agent with model={args.model}, memory={args.memory}")
+    logger.info(f"Starting CLI Agent {args.agent} with model={args.model or 'default'}, memory={args.memory}")
 
     # Load all tools
     tools = load_all_tools()
@@ -64,21 +66,10 @@ def main():
     if args.memory == "short":
         memory = ShortTermMemory(window_size=10)
     else:
-        memory = PersistentMemory(user_id=args.user)
-
-    # Setup agent
-    # For demonstration, using a basic system prompt; can be customized per agent
-    system_prompt = (
-        "You are {agent_name}, a professional AI crypto analyst. "
-        "Answer clearly, use tools when appropriate, and never provide financial advice."
-    ).format(agent_name=args.agent)
-    agent = Agent(
-        name=args.agent,
-        system_prompt=system_prompt,
-        tools=list(tools.values()),
-        memory=memory.get(),
-        model=args.model
-    )
+        memory = MemoryManager().get_memory(args.user)
+
+    # Setup agent from its registered definition
+    agent = create_agent(args.agent, model=args.model) if args.model else get_agent(args.agent)
 
     # Interactive loop
     print("\n=== Nexithium CLI Agent ===")
@@ -101,7 +92,11 @@ def main():
             print("  help                 Show this help message")
             print("  exit, quit           Exit the CLI")
             print("  tools                List available tools")
+            print("  agents               List registered agents")
+            print("  stats                Show prompt-cache, speculation and usage statistics")
             print("  use <tool> [args]    Invoke a tool with arguments")
+            print("  analyze <token>      Token analysis")
+            print("  forecast <token>     Scenario forecast")
             print("  <any other text>     Chat with the AI agent")
             continue
         if user_input.lower() == "tools":
@@ -110,23 +105,40 @@ def main():
                 print(f"  - {name}")
             continue
 
+        if user_input.lower() == "agents":
+            print("Registered agents:")
+            for name in list_agents():
+                print(f"  - {name}")
+            continue
+
+        if user_input.lower() == "stats":
+            for key, value in agent.cache_stats.as_dict().items():
+                print(f"  {key}: {value}")
+            for key, value in agent.speculation_stats.as_dict().items():
+                print(f"  speculation_{key}: {value}")
+            for key, value in agent.governor.user_usage(args.user).items():
+                print(f"  {key}: {value}")
+            continue
+
         parts = user_input.split()
         if parts[0] == "use":
             tool_name = parts[1]
-            args = parts[2:]
+            tool_args = parts[2:]
             try:
                 tool_func = get_tool(tool_name)
-                result = tool_func(*args)
+                result = tool_func(*tool_args)
                 print(f"[Tool:{tool_name}]> {result}")
             except Exception as e:
                 print(f"Error invoking tool '{tool_name}': {e}")
             continue
 
         # Default: send to agent
-        memory.add("user", user_input)
-        agent.memory = memory.get()
-        response = agent.run(user_input)
+        if parts[0].lower() in ("analyze", "forecast") and len(parts) > 1:
+            response = agent.run_command(parts[0].lower(), parts[1], history=memory.get(), user_id=args.user)
+        else:
+            response = agent.run(user_input, history=memory.get(), user_id=args.user)
         print(f"Agent> {response}\n")
+        memory.add("user", user_input)
         memory.add("assistant", response)
 
 
@@ -6,11 +6,13 @@ Provides REST endpoints to interact with AI agents and their tools.
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security.api_key import APIKeyHeader
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, Optional
 import os
+import re
 from dotenv import load_dotenv
 
-from core.agent import Agent
+from core.agent_registry import get_agent
+from core.governor import governor
 from core.memory import MemoryManager, PersistentMemory
 from core.tools import load_all_tools, get_tool, list_tools
 
@@ -19,14 +21,41 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 NEXITHIUM_API_KEY = os.getenv("NEXITHIUM_API_KEY", "secret-key")
+AGENT_NAME = os.getenv("NEXITHIUM_AGENT", "CryptoVisionAPI")
+# Client and conversation ids end up in memory file names, joined by a '.'
+# that neither may contain
+USER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+DEFAULT_CLIENT = "api_user"
+ADMIN_CLIENT = "admin"
+NEXITHIUM_ADMIN_KEY = os.getenv("NEXITHIUM_ADMIN_KEY")
+
+def load_api_clients(spec: str) -> Dict[str, str]:
+    """Parse per-client keys given as "client:key,client:key"."""
+    clients = {}
+    for item in spec.split(","):
+        client, _, key = item.strip().partition(":")
+        if not client or not key:
+            continue
+        if not USER_ID_RE.fullmatch(client) or client == ADMIN_CLIENT:
+            raise ValueError(f"Invalid client name '{client}' in NEXITHIUM_API_KEYS")
+        clients[key] = client
+    return clients
+
+# Optional per-client keys; LLM quotas are tracked per client
+API_CLIENTS = load_api_clients(os.getenv("NEXITHIUM_API_KEYS", ""))
 
 # API key security
 api_key_header = APIKeyHeader(name="X-API-Key")
 
-def verify_api_key(api_key: str = Depends(api_key_header)):
+def verify_api_key(api_key: str = Depends(api_key_header)) -> str:
+    """Return the client the key belongs to."""
+    if NEXITHIUM_ADMIN_KEY and api_key == NEXITHIUM_ADMIN_KEY:
+        return ADMIN_CLIENT
+    if api_key in API_CLIENTS:
+        return API_CLIENTS[api_key]
     if api_key != NEXITHIUM_API_KEY:
         raise HTTPException(status_code=403, detail="Could not validate credentials")
-    return api_key
+    return DEFAULT_CLIENT
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -41,24 +70,11 @@ app = FastAPI(
 tool_registry = load_all_tools()
 memory_manager = MemoryManager()
 
-# Define system prompt
-SYSTEM_PROMPT = """
-You are CryptoVisionAPI — a professional crypto market analysis assistant.
-Provide clear, accurate, and neutral answers. Use your tools when needed.
-Never provide investment advice.
-"""
-
-# Initialize agent
-agent = Agent(
-    name="CryptoVisionAPI",
-    system_prompt=SYSTEM_PROMPT,
-    tools=list(tool_registry.values()),
-    memory=[]
-)
-
 # Pydantic schema for chat
 class ChatRequest(BaseModel):
     input: str
+    # Separates conversations within one client; quotas stay per client
+    user: Optional[str] = None
 
 # Root endpoint
 @app.get("/", tags=["Meta"])
@@ -72,26 +88,56 @@ async def get_tools() -> Dict[str, str]:
     """Return available tool names."""
     return {"tools": list_tools()}
 
+# Prompt-cache statistics
+@app.get("/stats", tags=["Meta"], dependencies=[Depends(verify_api_key)])
+async def get_stats():
+    """Return prompt-cache (cached-token) and speculative tool-call statistics."""
+    agent = get_agent(AGENT_NAME)
+    return {
+        "agent": agent.name,
+        "prefix": agent.prefix_key,
+        "prompt_cache": agent.cache_stats.as_dict(),
+        "speculation": agent.speculation_stats.as_dict(),
+    }
+
+# LLM usage and cost accounting
+@app.get("/usage", tags=["Meta"])
+async def get_usage(client: str = Depends(verify_api_key)):
+    """Return the caller's usage; the admin key gets totals per user, agent and command."""
+    if client == ADMIN_CLIENT:
+        return governor.snapshot()
+    return {"user": client, "usage": governor.user_usage(client)}
+
+@app.get("/usage/{user_id}", tags=["Meta"])
+async def get_user_usage(user_id: str, client: str = Depends(verify_api_key)):
+    """Return one client's totals and remaining token quota; clients may only read their own."""
+    if client not in (user_id, ADMIN_CLIENT):
+        raise HTTPException(status_code=403, detail="Not allowed to read another client's usage")
+    return {"user": user_id, "usage": governor.user_usage(user_id)}
+
 # Chat endpoint
-@app.post("/chat", tags=["Agent"], dependencies=[Depends(verify_api_key)])
-async def chat_endpoint(request: ChatRequest):
+# Plain def: the blocking governor, LLM and tool work runs in FastAPI's threadpool
+@app.post("/chat", tags=["Agent"])
+def chat_endpoint(request: ChatRequest, client: str = Depends(verify_api_key)):
     """
     Interact with the AI agent. 
     Supported commands:
     - `price <TOKEN>`: get real-time price
     - `trend <TOKEN>`: short-term trend
+    - `research <TOKEN>`: market, trend, description and news in one call
     - `analyze <TOKEN>`: detailed analysis
     - `forecast <TOKEN>`: scenario forecast
     - `tools`: list tools
     Any other text is treated as free-form chat.
     """
     user_input = request.input.strip()
-    user_id = "api_user"
-    mem = memory_manager.get_memory(user_id)
-
-    # Save user message
-    mem.add("user", user_input)
-    agent.memory = mem.get()
+    if request.user is not None and not USER_ID_RE.fullmatch(request.user):
+        raise HTTPException(status_code=400, detail="user may only contain letters, digits, '_' and '-' (max 64)")
+    # The API key, not the client-supplied user, decides whose quota is charged
+    user_id = client
+    mem = memory_manager.get_memory(client if request.user is None else f"{client}.{request.user}")
+    agent = get_agent(AGENT_NAME)
+    history = mem.get()
 
     parts = user_input.split(maxsplit=1)
     cmd = parts[0].lower()
@@ -102,17 +148,18 @@ async def chat_endpoint(request: ChatRequest):
         response = get_tool("get_price")(arg)
     elif cmd == "trend" and arg:
         response = get_tool("token_trend")(arg)
-    elif cmd == "analyze" and arg:
-        response = agent.run(f"Analyze {arg}. Include overview, strengths, risks, use cases, outlook.")
-    elif cmd == "forecast" and arg:
-        response = agent.run(f"Forecast scenarios for {arg}. Hypothetical scenario, not financial advice.")
+    elif cmd == "research" and arg:
+        response = get_tool("research")(arg)
+    elif cmd in ("analyze", "forecast") and arg:
+        response = agent.run_command(cmd, arg, history=history, user_id=user_id)
     elif cmd == "tools":
         response = ", ".join(list_tools())
     else:
         # Free-form chat
-        response = agent.run(user_input)
+        response = agent.run(user_input, history=history, user_id=user_id)
 
-    # Save assistant message
+    # Save the exchange
+    mem.add("user", user_input)
     mem.add("assistant", response)
 
     return {"response": response}
@@ -11,14 +11,19 @@ from telegram.ext import (
     CallbackQueryHandler, ContextTypes, filters
 )
 from dotenv import load_dotenv
-from core.agent import Agent
+from core.agent_registry import get_agent
+from core.alerts import ALERTS_PATH, AlertEngine, format_price, run_alert_loop
 from core.memory import MemoryManager
 from core.tools import load_all_tools, list_tools, get_tool
+from interfaces.telegram_pipeline import BUSY_MESSAGE, PipelineOverloaded, UpdatePipeline
+from tools.coingecko import get_prices, to_token_id
 
 # Load environment variables
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_KEY = os.getenv("NEXITHIUM_API_KEY", "secret-key")
+AGENT_NAME = os.getenv("NEXITHIUM_AGENT", "CryptoVision")
+ALERT_INTERVAL = float(os.getenv("ALERT_INTERVAL_SECONDS", "60"))
 
 # Configure logging
 logging.basicConfig(
@@ -30,20 +35,8 @@ logger = logging.getLogger(__name__)
 # Initialize core components
 tools = load_all_tools()
 memory_manager = MemoryManager()
-
-# System prompt template
-SYSTEM_PROMPT = (
-    "You are CryptoVision, a professional AI crypto analyst. "
-    "Answer clearly, use tools when appropriate, and never provide financial advice."
-)
-
-# Instantiate Agent
-agent = Agent(
-    name="CryptoVision",
-    system_prompt=SYSTEM_PROMPT,
-    tools=list(tools.values()),
-    memory=[]
-)
+alert_engine = AlertEngine(ALERTS_PATH)
+pipeline = UpdatePipeline.from_env()
 
 # Inline menu keyboard
 MENU_KEYBOARD = [
@@ -65,14 +58,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Display help text."""
     help_text = (
-        "/start - show menu
-"        "help - show this message
-"        "price <symbol> - get current price
-"        "trend <symbol> - get 2-day trend
-"        "analyze <symbol> - project analysis
-"        "forecast <symbol> - future scenario
-"        "tools - list available tools
-"    )
+        "/start - show menu\n"
+        "help - show this message\n"
+        "price <symbol> - get current price\n"
+        "trend <symbol> - get 2-day trend\n"
+        "analyze <symbol> - project analysis\n"
+        "forecast <symbol> - future scenario\n"
+        "alert <symbol> above|below <price> - price alert\n"
+        "alert <symbol> +5% - alert on a move from the current price\n"
+        "alerts - list your alerts\n"
+        "unalert <id> - remove an alert\n"
+        "tools - list available tools\n"
+    )
     await update.message.reply_text(help_text)
 
 async def tools_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -80,11 +77,73 @@ async def tools_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     names = list_tools()
     await update.message.reply_text("Available tools: " + ", ".join(names))
 
+def alert_command(user_id: str, arg: str) -> str:
+    """Register an alert from 'BTC above 70000' or 'SOL -5%'."""
+    parts = arg.split()
+    is_threshold = len(parts) == 3 and parts[1].lower() in ('above', 'below')
+    if not is_threshold and not (len(parts) == 2 and parts[1].endswith('%')):
+        return "Usage: alert <symbol> above|below <price>, or alert <symbol> +5%"
+    try:
+        # One price lookup also rejects ids CoinGecko does not know, which would never fire
+        token_id = to_token_id(parts[0])
+        price = get_prices([token_id]).get(token_id)
+        if price is None:
+            return f"⚠️ Price not available for *{parts[0].upper()}*."
+        if is_threshold:
+            alert = alert_engine.add(user_id, token_id, parts[1].lower(), float(parts[2].lstrip('$').replace(',', '')))
+        else:
+            alert = alert_engine.add_percent(user_id, token_id, float(parts[1].rstrip('%')), price)
+    except ValueError as e:
+        return f"❌ Invalid alert: {e}"
+    except Exception as e:
+        return f"❌ Error fetching price: {e}"
+    return f"🔔 Alert set: {alert.describe()}"
+
+def alerts_command(user_id: str) -> str:
+    alerts = alert_engine.for_user(user_id)
+    if not alerts:
+        return "You have no active alerts."
+    return "🔔 Your alerts:\n" + "\n".join(a.describe() for a in alerts)
+
+def respond(user_id: str, user_input: str, cmd: str, arg: str) -> str:
+    """Blocking part of a text update: tools, agent calls and memory writes."""
+    # Price alerts
+    if cmd == 'alert':
+        return alert_command(user_id, arg)
+    if cmd == 'alerts':
+        return alerts_command(user_id)
+    if cmd == 'unalert':
+        removed = arg.lstrip('#').isdigit() and alert_engine.remove(int(arg.lstrip('#')), user_id)
+        return "🔕 Alert removed." if removed else "⚠️ No such alert."
+
+    # Tool invocation
+    if cmd in tools:
+        return get_tool(cmd)(arg)
+
+    # Predefined commands
+    mem = memory_manager.get_memory(user_id)
+    agent = get_agent(AGENT_NAME)
+    history = mem.get()
+    if cmd == 'price' and arg:
+        result = get_tool('get_price')(arg)
+    elif cmd == 'trend' and arg:
+        result = get_tool('token_trend')(arg)
+    elif cmd in ('analyze', 'forecast') and arg:
+        # analysis via agent
+        result = agent.run_command(cmd, arg, history=history, user_id=user_id)
+    else:
+        # free chat through agent
+        result = agent.run(user_input, history=history, user_id=user_id)
+
+    # Save memory
+    mem.add('user', user_input)
+    mem.add('assistant', result)
+    return result
+
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Main text handler: commands or free chat."""
     user_input = update.message.text.strip()
     user_id = str(update.message.chat_id)
-    mem = memory_manager.get_memory(user_id)
 
     # Authentication stub (if needed)
     # if context.bot_data.get('api_key') != API_KEY:
@@ -106,34 +165,14 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cmd = parts[0].lower()
     arg = parts[1] if len(parts) > 1 else ''
 
-    # Tool invocation
-    if cmd in tools:
-        result = get_tool(cmd)(arg)
-        await update.message.reply_text(result)
-        return
-
-    # Predefined commands
-    if cmd == 'price' and arg:
-        result = get_tool('get_price')(arg)
-    elif cmd == 'trend' and arg:
-        result = get_tool('token_trend')(arg)
-    elif cmd == 'analyze' and arg:
-        # analysis via agent
-        mem.add('user', user_input)
-        agent.memory = mem.get()
-        result = agent.run(f"Analyze {arg}. Include overview, strengths, risks, use cases, outlook.")
-    elif cmd == 'forecast' and arg:
-        mem.add('user', user_input)
-        agent.memory = mem.get()
-        result = agent.run(f"Forecast scenarios for {arg}. Hypothetical, not financial advice.")
-    else:
-        # free chat through agent
-        mem.add('user', user_input)
-        agent.memory = mem.get()
-        result = agent.run(user_input)
-
-    # Save memory and reply
-    mem.add('assistant', result)
+    # Argument-less tool calls are the cheapest to retry, so they are shed first
+    try:
+        result = await pipeline.run(
+            user_id, respond, user_id, user_input, cmd, arg,
+            bot=context.bot, low_priority=(cmd in tools and not arg)
+        )
+    except PipelineOverloaded:
+        result = BUSY_MESSAGE
     await update.message.reply_text(result)
 
 async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -146,7 +185,13 @@ async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         tool_name = data.split(':',1)[1]
         content = ''
         if tool_name in tools:
-            content = get_tool(tool_name)('')
+            try:
+                content = await pipeline.run(
+                    str(query.message.chat_id), get_tool(tool_name), '',
+                    bot=context.bot, low_priority=True
+                )
+            except PipelineOverloaded:
+                content = BUSY_MESSAGE
         else:
             content = f"Tool {tool_name} not found."
     elif data == 'analyze':
@@ -158,9 +203,25 @@ async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await query.edit_message_text(text=content)
 
+# --- Alerts ---
+async def start_alert_loop(app):
+    """Push fired alerts to their chats; one batched price fetch serves every subscriber."""
+    async def notify(alert, price):
+        await app.bot.send_message(
+            chat_id=alert.user_id,
+            text=f"🔔 *{alert.token_id}* is at *{format_price(price)}* — {alert.describe()}",
+            parse_mode="Markdown"
+        )
+    app.create_task(run_alert_loop(alert_engine, get_prices, notify, ALERT_INTERVAL))
+
 # --- Main ---
 def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = (
+        ApplicationBuilder().token(TELEGRAM_TOKEN)
+        .concurrent_updates(True)
+        .post_init(start_alert_loop)
+        .build()
+    )
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CommandHandler('help', help_command))
     app.add_handler(CommandHandler('tools', tools_command))
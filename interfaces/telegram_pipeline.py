@@ -0,0 +1,114 @@
+"""
+Concurrent update pipeline for the Telegram bots.
+
+Blocking work (LLM calls, tool HTTP requests, memory writes) runs in worker
+threads so one slow chat never stalls the others. Updates from the same chat
+are processed in order, at most `max_workers` run at once, and beyond
+`max_pending` in-flight updates new work is shed. Low-priority work is shed
+earlier, once half of that limit is reached.
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "⏳ The bot is busy right now, please try again in a moment."
+
+
+class PipelineOverloaded(Exception):
+    """Raised when an update is shed because too much work is pending."""
+
+
+class UpdatePipeline:
+    def __init__(self, max_workers: int = 8, max_pending: int = 100, typing_interval: float = 4.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.low_priority_limit = max_pending // 2
+        self.typing_interval = typing_interval
+        self.pending = 0
+        # Own pool, so pipeline work never queues behind other users of the
+        # loop's default executor (e.g. the alert loop's price fetches)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="telegram-pipeline")
+        self._workers: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[Any, asyncio.Lock] = {}
+        self._chat_waiters: Dict[Any, int] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.shed = 0
+        self.max_seen_pending = 0
+        self.busy_seconds = 0.0
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> "UpdatePipeline":
+        return cls(
+            max_workers=int(os.getenv("TELEGRAM_MAX_WORKERS", "8")),
+            max_pending=int(os.getenv("TELEGRAM_MAX_PENDING", "100")),
+        )
+
+    async def run(self, chat_id, func: Callable, *args, bot=None, low_priority: bool = False):
+        """
+        Run blocking `func(*args)` for a chat and return its result.
+        Raises PipelineOverloaded if the update is shed.
+        """
+        limit = self.low_priority_limit if low_priority else self.max_pending
+        if self.pending >= limit:
+            self.shed += 1
+            logger.info("Shedding update for chat %s (%d pending, low_priority=%s)",
+                        chat_id, self.pending, low_priority)
+            raise PipelineOverloaded()
+        if self._workers is None:
+            # Created lazily so it binds to the running event loop
+            self._workers = asyncio.Semaphore(self.max_workers)
+
+        self.submitted += 1
+        self.pending += 1
+        self.max_seen_pending = max(self.max_seen_pending, self.pending)
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_waiters[chat_id] = self._chat_waiters.get(chat_id, 0) + 1
+        try:
+            async with lock, self._workers:
+                typing = asyncio.create_task(self._keep_typing(bot, chat_id)) if bot is not None else None
+                start = time.monotonic()
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+                finally:
+                    self.busy_seconds += time.monotonic() - start
+                    if typing is not None:
+                        typing.cancel()
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._chat_waiters[chat_id] -= 1
+            if not self._chat_waiters[chat_id]:
+                del self._chat_waiters[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def _keep_typing(self, bot, chat_id):
+        # Telegram shows "typing…" for ~5 seconds per action
+        try:
+            while True:
+                await bot.send_chat_action(chat_id=chat_id, action="typing")
+                await asyncio.sleep(self.typing_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug("typing indicator failed for chat %s: %s", chat_id, e)
+
+    def stats(self) -> Dict[str, float]:
+        elapsed = time.monotonic() - self._started
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "shed": self.shed,
+            "pending": self.pending,
+            "max_pending": self.max_seen_pending,
+            "throughput_per_s": round(self.completed / elapsed, 3) if elapsed else 0.0,
+            "worker_utilization": round(self.busy_seconds / (elapsed * self.max_workers), 3) if elapsed else 0.0,
+        }
@@ -2,7 +2,9 @@ import os
 from telegram import Update
 from telegram.ext import ApplicationBuilder, MessageHandler, ContextTypes, filters
 from dotenv import load_dotenv
-from core.agent import Agent
+from core.agent_registry import get_agent
+from core.memory import MemoryManager
+from interfaces.telegram_pipeline import BUSY_MESSAGE, PipelineOverloaded, UpdatePipeline
 from tools.coingecko import get_price
 
 load_dotenv()
@@ -13,33 +15,38 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 import openai
 openai.api_key = OPENAI_API_KEY
 
-crypto_agent = Agent(
-    name="CryptoVision",
-    system_prompt="""
-You are CryptoVision — a professional crypto market analyst.
-You answer clearly, concisely, and accurately. Use logic, token fundamentals, and macro context.
-If the user asks about price, try to use your tools. Never provide financial advice.
-""",
-    tools=[get_price],
-    memory=[]
-)
+AGENT_NAME = "CryptoVisionConcise"
+memory = MemoryManager()
+pipeline = UpdatePipeline.from_env()
+
+def respond(user_id: str, user_input: str) -> str:
+    # The agent instance is shared, so each chat's history comes from its own memory
+    mem = memory.get_memory(user_id)
+    response = get_agent(AGENT_NAME).run(user_input, history=mem.get(), user_id=user_id)
+    mem.add("user", user_input)
+    mem.add("assistant", response)
+    return response
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_input = update.message.text.strip()
-
-    if user_input.lower().startswith("price"):
-        parts = user_input.split()
-        if len(parts) >= 2:
-            result = get_price(parts[1])
+    chat_id = str(update.effective_chat.id)
+
+    try:
+        if user_input.lower().startswith("price"):
+            parts = user_input.split()
+            if len(parts) >= 2:
+                result = await pipeline.run(chat_id, get_price, parts[1], bot=context.bot)
+            else:
+                result = "Please specify a token symbol, e.g. 'price BTC'"
         else:
-            result = "Please specify a token symbol, e.g. 'price BTC'"
-    else:
-        result = crypto_agent.run(user_input)
+            result = await pipeline.run(chat_id, respond, chat_id, user_input, bot=context.bot)
+    except PipelineOverloaded:
+        result = BUSY_MESSAGE
 
     await context.bot.send_message(chat_id=update.effective_chat.id, text=result, parse_mode="Markdown")
 
 if __name__ == '__main__':
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = ApplicationBuilder().token(TELEGRAM_TOKEN).concurrent_updates(True).build()
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     print("🤖 CryptoVision Telegram bot is running...")
     app.run_polling()
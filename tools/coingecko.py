@@ -1,23 +1,28 @@
 import requests
+from typing import Dict, Iterable, List
+
+# Mapping common symbols to CoinGecko IDs
+SYMBOL_MAP = {
+    "btc": "bitcoin",
+    "eth": "ethereum",
+    "sol": "solana",
+    "avax": "avalanche",
+    "doge": "dogecoin",
+    "link": "chainlink",
+    "ada": "cardano",
+    "matic": "matic-network",
+}
+
+def to_token_id(symbol: str) -> str:
+    token_id = symbol.strip().lower()
+    return SYMBOL_MAP.get(token_id, token_id)
 
 def get_price(symbol: str) -> str:
     """
     Fetch current USD price for a token via CoinGecko.
     Usage: get_price("bitcoin") or get_price("BTC")
     """
-    token_id = symbol.lower()
-    # Mapping common symbols to CoinGecko IDs
-    SYMBOL_MAP = {
-        "btc": "bitcoin",
-        "eth": "ethereum",
-        "sol": "solana",
-        "avax": "avalanche",
-        "doge": "dogecoin",
-        "link": "chainlink",
-        "ada": "cardano",
-        "matic": "matic-network",
-    }
-    token_id = SYMBOL_MAP.get(token_id, token_id)
+    token_id = to_token_id(symbol)
     try:
         res = requests.get(
             "https://api.coingecko.com/api/v3/simple/price",
@@ -32,3 +37,22 @@ def get_price(symbol: str) -> str:
         return f"⚠️ Price not available for *{symbol.upper()}*."
     except Exception as e:
         return f"❌ Error fetching price: {e}"
+
+def get_prices(token_ids: Iterable[str], batch_size: int = 250) -> Dict[str, float]:
+    """
+    Fetch USD prices for many CoinGecko ids with one request per batch.
+    Ids without a price are left out of the result.
+    """
+    ids: List[str] = sorted(set(token_ids))
+    prices: Dict[str, float] = {}
+    for i in range(0, len(ids), batch_size):
+        res = requests.get(
+            "https://api.coingecko.com/api/v3/simple/price",
+            params={"ids": ",".join(ids[i:i + batch_size]), "vs_currencies": "usd"},
+            timeout=10
+        )
+        res.raise_for_status()
+        for token_id, quote in res.json().items():
+            if quote.get("usd") is not None:
+                prices[token_id] = float(quote["usd"])
+    return prices
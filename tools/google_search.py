@@ -1,30 +1,40 @@
 import os
 import requests
+from typing import Dict, List
+
+from tools.search_cache import search_cache
 
 # This example uses Serper.dev as a Google-search proxy. Sign up for an API key!
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 
+def fetch_search_results(query: str) -> List[Dict[str, str]]:
+    r = requests.post(
+        "https://google.serper.dev/search",
+        headers={"X-API-KEY": SERPER_API_KEY},
+        json={"q": query},
+        timeout=5
+    )
+    r.raise_for_status()
+    return [
+        {"title": item.get("title"), "url": item.get("link")}
+        for item in r.json().get("organic", [])[:3]
+    ]
+
 def google_search(query: str) -> str:
     """
     Return top-3 organic results from a Google-like search.
+    Results are cached per normalized query (see tools/search_cache.py).
     """
     if not SERPER_API_KEY:
         return "⚠️ SERPER_API_KEY not set in environment."
     try:
-        r = requests.post(
-            "https://google.serper.dev/search",
-            headers={"X-API-KEY": SERPER_API_KEY},
-            json={"q": query},
-            timeout=5
-        )
-        r.raise_for_status()
-        results = r.json().get("organic", [])[:3]
+        results = search_cache.get("google_search", query, fetch_search_results)
         if not results:
             return "🔍 No results found."
         reply = "📄 *Top search results:*\n"
         for item in results:
             title = item.get("title")
-            link  = item.get("link")
+            link  = item.get("url")
             reply += f"- [{title}]({link})\n"
         return reply
     except Exception as e:
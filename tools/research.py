@@ -0,0 +1,91 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Tuple
+
+from tools.coingecko import to_token_id
+from tools.google_search import google_search
+from tools.search_cache import search_cache
+from tools.tavily import tavily_news
+from tools.token_description import token_description
+from tools.token_market_data import token_market_data
+from tools.token_trend import token_trend
+
+logger = logging.getLogger(__name__)
+
+def _headline_query(token_id: str) -> str:
+    return f"{token_id} crypto news"
+
+# source name -> (tool, query builder, deadline in seconds from fan-out start)
+SOURCES: Dict[str, Tuple[Callable[[str], str], Callable[[str], str], float]] = {
+    "market": (token_market_data, lambda token_id: token_id, 3.0),
+    "trend": (token_trend, lambda token_id: token_id, 3.0),
+    "description": (token_description, lambda token_id: token_id, 2.5),
+    "news": (tavily_news, _headline_query, 4.0),
+    "search": (google_search, _headline_query, 4.0),
+}
+# Sources whose results are combined into one deduplicated headline list,
+# mapped to their search cache source names
+HEADLINE_SOURCES = {"news": "tavily_news", "search": "google_search"}
+SOURCE_MAX_CHARS = 400
+CONTEXT_MAX_CHARS = 1600
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="research")
+
+
+def _usable(result: str) -> bool:
+    # Tools report failures as strings rather than raising
+    return bool(result) and not result.startswith(("❌", "⚠️"))
+
+def _clip(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def research(symbol: str) -> str:
+    """
+    Query market data, trend, description, news and web search for a token
+    concurrently and return a compact context block. Each source has its own
+    deadline; sources that miss it or fail are left out.
+    """
+    symbol = symbol.strip()
+    if not symbol:
+        return "⚠️ Please specify a token symbol, e.g. 'research SOL'."
+    token_id = to_token_id(symbol)
+
+    start = time.monotonic()
+    futures = {
+        name: (_executor.submit(tool, query(token_id)), deadline)
+        for name, (tool, query, deadline) in SOURCES.items()
+    }
+
+    sections = []
+    headline_sources = []
+    for name, (future, deadline) in sorted(futures.items(), key=lambda item: item[1][1]):
+        try:
+            result = future.result(timeout=max(0.0, start + deadline - time.monotonic()))
+        except TimeoutError:
+            logger.info("research: %s missed its %.1fs deadline for %s", name, deadline, token_id)
+            continue
+        except Exception as e:
+            logger.warning("research: %s failed for %s: %s", name, token_id, e)
+            continue
+        if not _usable(result):
+            continue
+        if name in HEADLINE_SOURCES:
+            headline_sources.append(HEADLINE_SOURCES[name])
+        else:
+            sections.append(f"[{name}]\n{_clip(result, SOURCE_MAX_CHARS)}")
+
+    if headline_sources:
+        # The same story often comes back from both providers
+        items = search_cache.merged(_headline_query(token_id), headline_sources)
+        lines = "\n".join(f"- [{item.get('title')}]({item.get('url')})" for item in items)
+        if lines:
+            sections.append(f"[headlines]\n{_clip(lines, SOURCE_MAX_CHARS)}")
+
+    logger.debug("research: %s gathered %d/%d sources in %.2fs",
+                 token_id, len(sections), len(SOURCES), time.monotonic() - start)
+    if not sections:
+        return f"No research data available for {symbol.upper()}."
+    return _clip("\n\n".join(sections), CONTEXT_MAX_CHARS)
@@ -0,0 +1,211 @@
+import atexit
+import heapq
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from tools.coingecko import SYMBOL_MAP
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join("cache", "search_cache.json"))
+
+# Seconds a result stays fresh, per source
+SOURCE_TTLS = {
+    "google_search": 6 * 3600,
+    "tavily_news": 15 * 60,
+}
+DEFAULT_TTL = 3600
+# How long past its TTL a result may still be served while it is refreshed
+STALE_TTL = 24 * 3600
+MAX_ENTRIES = 5000
+# Fraction of entries kept after an eviction pass, so evictions are batched
+EVICT_TO = 0.9
+# Seconds to coalesce writes before persisting the cache
+SAVE_DELAY = 5.0
+# Sources whose queries are always about tokens, so symbols may be aliased
+SYMBOL_SOURCES = {"tavily_news"}
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "in", "on", "to", "about", "with",
+    "is", "are", "what", "whats", "latest", "today", "now", "me", "show", "please",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-\.]*")
+
+
+def normalize_query(query: str, symbols: bool = False) -> str:
+    """
+    Reduce a query to a canonical cache key: lowercase, stopwords removed,
+    word order kept. With `symbols`, token symbols are mapped to their
+    CoinGecko ids, so that "Latest SOL news" and "solana news" share an entry.
+    """
+    words = []
+    for word in _TOKEN_RE.findall(query.lower()):
+        word = word.strip(".-")
+        if word and word not in STOPWORDS:
+            words.append(SYMBOL_MAP.get(word, word) if symbols else word)
+    return " ".join(words)
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL for deduplication: no scheme/`www.`/fragment differences,
+    no tracking parameters, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query)
+        if not k.lower().startswith("utm_") and k.lower() not in {"ref", "fbclid", "gclid"}
+    ])
+    return urlunsplit(("https", host, parts.path.rstrip("/"), query, ""))
+
+def dedupe(items: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+    seen = set()
+    unique = []
+    for item in items:
+        key = canonical_url(item.get("url", ""))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique
+
+
+class SearchCache:
+    """
+    Disk-backed cache of search results keyed by source and normalized query.
+    Stale entries are served immediately while a background thread refreshes them.
+    """
+    def __init__(self, path: str = SEARCH_CACHE_PATH, max_entries: int = MAX_ENTRIES, save_delay: float = SAVE_DELAY):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._refreshing = set()
+        self.entries: Dict[str, Dict] = self._load()
+
+    @staticmethod
+    def _key(source: str, query: str) -> str:
+        return f"{source}:{normalize_query(query, symbols=source in SYMBOL_SOURCES)}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable search cache %s: %s", self.path, e)
+        return {}
+
+    def save(self):
+        # Writers are serialized so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                snapshot = json.dumps(self.entries)
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".search_cache.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def flush(self):
+        """
+        Persist pending changes now. A failed write is logged; the in-memory
+        entries still serve lookups.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning("Could not persist search cache %s: %s", self.path, e)
+
+    def _schedule_save(self):
+        # Coalesce the writes of a burst of misses into one save
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def put(self, source: str, query: str, items: List[Dict[str, str]]):
+        key = self._key(source, query)
+        with self._lock:
+            self.entries[key] = {"fetched_at": time.time(), "items": dedupe(items)}
+            if len(self.entries) > self.max_entries:
+                excess = len(self.entries) - int(self.max_entries * EVICT_TO)
+                for old_key in heapq.nsmallest(excess, self.entries, key=lambda k: self.entries[k]["fetched_at"]):
+                    del self.entries[old_key]
+        self._schedule_save()
+
+    def peek(self, source: str, query: str) -> Optional[Dict]:
+        with self._lock:
+            return self.entries.get(self._key(source, query))
+
+    def get(self, source: str, query: str, fetch: Callable[[str], List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """
+        Return cached items for `query`, calling `fetch(query)` on a miss.
+        """
+        entry = self.peek(source, query)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            ttl = SOURCE_TTLS.get(source, DEFAULT_TTL)
+            if age < ttl:
+                return entry["items"]
+            if age < ttl + STALE_TTL:
+                self._revalidate(source, query, fetch)
+                return entry["items"]
+        items = fetch(query)
+        self.put(source, query, items)
+        return dedupe(items)
+
+    def _revalidate(self, source: str, query: str, fetch: Callable[[str], List[Dict[str, str]]]):
+        key = self._key(source, query)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(source, query, fetch(query))
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"search-refresh:{key}", daemon=True).start()
+
+    def merged(self, query: str, sources: Iterable[str] = tuple(SOURCE_TTLS)) -> List[Dict[str, str]]:
+        """
+        All cached items for `query` across sources, deduplicated by URL.
+        """
+        items = []
+        for source in sources:
+            entry = self.peek(source, query)
+            if entry is not None:
+                items.extend(entry["items"])
+        return dedupe(items)
+
+
+search_cache = SearchCache()
+atexit.register(search_cache.flush)
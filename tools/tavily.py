@@ -1,24 +1,34 @@
 import os
 import requests
+from typing import Dict, List
+
+from tools.search_cache import search_cache
 
 # Placeholder VIP API key for Tavily (crypto news/search)
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+def fetch_news(query: str) -> List[Dict[str, str]]:
+    r = requests.get(
+        "https://api.tavily.ai/v1/news",
+        params={"q": query, "limit": 3},
+        headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
+        timeout=5
+    )
+    r.raise_for_status()
+    return [
+        {"title": art["title"], "url": art["url"]}
+        for art in r.json().get("articles", [])
+    ]
+
 def tavily_news(query: str = "crypto news") -> str:
     """
     Fetch latest headlines via Tavily (or similar) API.
+    Results are cached per normalized query (see tools/search_cache.py).
     """
     if not TAVILY_API_KEY:
         return "⚠️ TAVILY_API_KEY not set in environment."
     try:
-        r = requests.get(
-            "https://api.tavily.ai/v1/news",
-            params={"q": query, "limit": 3},
-            headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
-            timeout=5
-        )
-        r.raise_for_status()
-        items = r.json().get("articles", [])
+        items = search_cache.get("tavily_news", query, fetch_news)
         if not items:
             return "📰 No news found."
         reply = "📰 *Recent news:*\n"
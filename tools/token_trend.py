@@ -1,20 +1,34 @@
-import requests
+import time
 
-def token_trend(token_id: str = "solana") -> str:
+from core.timeseries import INITIAL_BACKFILL_DAYS, store, valid_token_id
+
+def token_trend(token_id: str = "solana", days: int = 2) -> str:
     """
-    Analyze 2-day trend: % change and direction.
+    Analyze trend over `days` (default 2): % change and direction.
+    Served from the local time-series store, which is topped up incrementally.
     """
+    if not valid_token_id(token_id):
+        return f"No trend data for {token_id}."
     try:
-        url = f"https://api.coingecko.com/api/v3/coins/{token_id}/market_chart"
-        res = requests.get(url, params={"vs_currency": "usd", "days": 2}, timeout=5)
-        res.raise_for_status()
-        prices = res.json().get("prices", [])
+        days = int(days)
+        try:
+            store.backfill(token_id, days=max(days, INITIAL_BACKFILL_DAYS))
+        except Exception:
+            # Fall back to whatever is stored locally
+            if store.last_timestamp(token_id) is None:
+                raise
+        now_ms = int(time.time() * 1000)
+        rows = store.range(token_id, start_ms=now_ms - days * 86_400_000)
+        prices = rows["price"]
         if len(prices) < 2:
             return f"No trend data for {token_id}."
-        first = prices[0][1]
-        last  = prices[-1][1]
+        first = float(prices[0])
+        last  = float(prices[-1])
         change = (last - first) / first * 100
         direction = "upward 📈" if change > 0 else "downward 📉"
-        return f"{token_id.capitalize()} trend over 2 days: {direction} ({change:.2f}%)."
+        # Young tokens may have less history upstream than requested
+        covered = (now_ms - int(rows["ts"][0])) / 86_400_000
+        span = f"{days} days" if covered >= days - 1 else f"{covered:.0f} days (requested {days}, no older data available)"
+        return f"{token_id.capitalize()} trend over {span}: {direction} ({change:.2f}%)."
     except Exception as e:
         return f"❌ Trend error: {e}"